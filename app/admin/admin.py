@@ -1,14 +1,12 @@
 import os
-from sqlalchemy.orm import Session
+from sqlalchemy import select
 from app.db.database import SessionLocal
 from app.model.user import User
-from app.core.auth import hashed_password
+from app.core.hashing import password_hasher
 
-def create_default_admin():
-    db: Session = SessionLocal()
-
-    try:
-        admin = db.query(User).filter(User.role == "admin").first()
+async def create_default_admin():
+    async with SessionLocal() as db:
+        admin = await db.scalar(select(User).where(User.role == "admin").limit(1))
         if admin:
             return
 
@@ -22,13 +20,10 @@ def create_default_admin():
         admin_user = User(
             username=username,
             email=email,
-            password=hashed_password(password),
+            password=await password_hasher.hash(password),
             role="admin"
         )
 
         db.add(admin_user)
-        db.commit()
+        await db.commit()
         print("Admin created from .env")
-
-    finally:
-        db.close()
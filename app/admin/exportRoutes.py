@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+from enum import Enum
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from app.db.database import SessionLocal
+from app.model.task import Task
+from app.model.notification import Notification
+from app.core.auth import required_role
+from app.core.config import EXPORT_CHUNK_SIZE
+
+router = APIRouter()
+
+
+class ExportFormat(str, Enum):
+    ndjson = 'ndjson'
+    csv = 'csv'
+
+
+TASK_COLUMNS = [Task.task_id, Task.task_name, Task.task_description, Task.task_status, Task.user_id]
+NOTIFICATION_COLUMNS = [Notification.id, Notification.user_id, Notification.message, Notification.is_read, Notification.created_at]
+
+
+def _cell(value):
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+async def stream_rows(columns, fmt: ExportFormat):
+    # the request session is closed before the body is sent, so the stream owns its session
+    async with SessionLocal() as db:
+        names = [column.key for column in columns]
+        stmt = (
+            select(*columns)
+            .order_by(columns[0])
+            .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == ExportFormat.csv:
+            writer.writerow(names)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+        # server-side cursor, fetched one chunk at a time
+        result = await db.stream(stmt)
+        async for rows in result.partitions():
+            for row in rows:
+                values = [_cell(value) for value in row]
+                if fmt == ExportFormat.csv:
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(names, values))))
+                    buffer.write("\n")
+
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+
+def export_response(columns, fmt: ExportFormat, name: str):
+    media_type = "text/csv" if fmt == ExportFormat.csv else "application/x-ndjson"
+    return StreamingResponse(
+        stream_rows(columns, fmt),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt.value}"'}
+    )
+
+
+@router.get('/export/tasks')
+async def export_tasks(format: ExportFormat = ExportFormat.ndjson,
+                 current_user: dict = Depends(required_role('admin'))):
+    return export_response(TASK_COLUMNS, format, "tasks")
+
+
+@router.get('/export/notifications')
+async def export_notifications(format: ExportFormat = ExportFormat.ndjson,
+                         current_user: dict = Depends(required_role('admin'))):
+    return export_response(NOTIFICATION_COLUMNS, format, "notifications")
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends, Query
+
+from app.db.database import engine
+from app.db.pool_metrics import pool_metrics
+from app.db.slow_query import slow_query_log
+from app.core.auth import required_role
+
+router = APIRouter()
+
+
+@router.get('/db/pool')
+async def db_pool_stats(current_user: dict = Depends(required_role('admin'))):
+    return pool_metrics.snapshot(engine.sync_engine)
+
+
+@router.get('/db/slow-queries')
+async def slow_queries(limit: int = Query(20, ge=1, le=500),
+                       current_user: dict = Depends(required_role('admin'))):
+    # worst statements first, by total time spent
+    return slow_query_log.report(limit)
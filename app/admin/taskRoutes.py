@@ -1,11 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import  Session
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 
 from app.db.dependency import get_db
 from app.model.task import Task
 from app.model.notification import Notification
 from app.core.auth import required_role
-from app.schemas.tasks import UpdateTask, CreateTask
+from app.core.cache import task_cache, invalidate_tasks
+from app.db.pagination import keyset_page
+from app.schemas.tasks import UpdateTask, CreateTask, TaskStatus, AdminTaskPage
+from app.core.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.notification.manager import manager
 
 router = APIRouter()
@@ -15,11 +20,11 @@ VALID_STATUS = {'pending', 'completed'}
 
 @router.post('/create')
 async def create_task(task: CreateTask,
-                db: Session = Depends(get_db),
+                db: AsyncSession = Depends(get_db),
                 current_user: dict = Depends(required_role('admin'))
 ):
     
-    existing_task = db.query(Task).filter(Task.task_name == task.task_name).first() 
+    existing_task = await db.scalar(select(Task).where(Task.task_name == task.task_name)) 
     
     if existing_task:
         raise HTTPException(status_code=400, detail="Task already exist")
@@ -36,23 +41,22 @@ async def create_task(task: CreateTask,
         
     )
     
-    db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
-    
-    
     notification_meassage = Notification(
         user_id = current_user["user_id"],
         message = "New task created by admin"
     )
     
-    db.add(notification_meassage)
-    db.commit()
-    db.refresh(notification_meassage)
+    # task and its notification land in one transaction
+    db.add_all([new_task, notification_meassage])
+    await db.commit()
+    invalidate_tasks(current_user["user_id"])
     
     await manager.send_to_user(
         user_id=current_user["user_id"],
-        message="Task created"
+        message="Task created",
+        event="task.created",
+        entity_id=new_task.task_id,
+        notification_id=notification_meassage.id
     )
     
     
@@ -63,36 +67,41 @@ async def create_task(task: CreateTask,
     }
 
 
-@router.get('/view-task')
-def admin_view_task(db: Session = Depends(get_db),
+@router.get('/view-task', response_model=AdminTaskPage)
+async def admin_view_task(request: Request,
+              cursor: Optional[int] = None,
+              limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+              task_status: Optional[TaskStatus] = None,
+              user_id: Optional[int] = None,
+              db: AsyncSession = Depends(get_db),
               current_user: dict = Depends(required_role('admin'))
 ):
     
-    tasks = db.query(Task).all()
-    
-    if not tasks:
-        raise HTTPException(status_code=404, detail="Task not found")
+    async def build():
+        stmt = select(Task.task_id, Task.task_name, Task.task_description, Task.task_status, Task.user_id)
+        
+        if user_id is not None:
+            stmt = stmt.where(Task.user_id == user_id)
+        
+        if task_status is not None:
+            stmt = stmt.where(Task.task_status == task_status)
+        
+        tasks, next_cursor = await keyset_page(db, stmt, Task.task_id, cursor, limit)
+        
+        return AdminTaskPage(items=tasks, next_cursor=next_cursor)
     
-     # Convert to list of dictionaries for JSON serialization
-    return [
-        {
-            'id': task.task_id,
-            'task_name': task.task_name,
-            'task_description': task.task_description,
-            'task_status': task.task_status
-        }
-        for task in tasks
-    ]
+    # every task write bumps the admin scope
+    return await task_cache.respond(request, "admin", (cursor, limit, task_status, user_id), build)
 
 
 @router.put("/update-task/{task_id}")
 async def admin_update_task(
     task_id: int,
     up_task: UpdateTask,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(required_role("admin"))
 ):
-    task = db.query(Task).filter(Task.task_id == task_id).first()
+    task = await db.scalar(select(Task).where(Task.task_id == task_id))
 
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -103,10 +112,10 @@ async def admin_update_task(
         raise HTTPException(status_code=400, detail="No data provided")
 
     if "task_name" in update_data:
-        existing_task = db.query(Task).filter(
+        existing_task = await db.scalar(select(Task).where(
             Task.task_name == update_data["task_name"],
             Task.task_id != task_id
-        ).first()
+        ))
 
         if existing_task:
             raise HTTPException(
@@ -117,20 +126,21 @@ async def admin_update_task(
     for key, value in update_data.items():
         setattr(task, key, value)
 
-    db.commit()
-    db.refresh(task)
-
     notification_message = Notification(
         user_id=task.user_id,
         message="Task updated"
     )
 
     db.add(notification_message)
-    db.commit()
+    await db.commit()
+    invalidate_tasks(task.user_id)
 
     await manager.send_to_user(
         user_id=task.user_id,
-        message="Task updated successfully"
+        message="Task updated successfully",
+        event="task.updated",
+        entity_id=task.task_id,
+        notification_id=notification_message.id
     )
 
     return {"message": "Task updated"}
@@ -138,13 +148,14 @@ async def admin_update_task(
 
 
 @router.delete('/task/{task_id}')
-def delete_task(task_id: int, db: Session = Depends(get_db), current_user: dict = Depends(required_role('admin'))):
-    task = db.query(Task).filter(Task.task_id == task_id).first()
+async def delete_task(task_id: int, db: AsyncSession = Depends(get_db), current_user: dict = Depends(required_role('admin'))):
+    task = await db.scalar(select(Task).where(Task.task_id == task_id))
     
     if not task:
         raise HTTPException(status_code=404, detail='Task not found')
     
-    db.delete(task)
-    db.commit()
+    await db.delete(task)
+    await db.commit()
+    invalidate_tasks(task.user_id)
     
     return {"message": "Task deleted"}
\ No newline at end of file
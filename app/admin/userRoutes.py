@@ -1,27 +1,34 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import  Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.dependency import get_db
 from app.model.user import User
 from app.model.notification import Notification
-from app.core.auth import required_role, hashed_password
-from app.schemas.users import RegistorUsers
+from app.core.auth import required_role, revocation_store
+from app.core.cache import invalidate_tasks
+from app.core.hashing import password_hasher
+from app.schemas.users import RegistorUsers, UserOut
 from app.notification.manager import manager
 
 
 router = APIRouter()
 
-@router.get('/users')
-def get_all_users(db: Session = Depends(get_db), current_user: dict = Depends(required_role('admin'))):
+USER_COLUMNS = (User.id, User.username, User.email, User.role)
+
+
+@router.get('/users', response_model=list[UserOut])
+async def get_all_users(db: AsyncSession = Depends(get_db), current_user: dict = Depends(required_role('admin'))):
     
-    return db.query(User).all()
+    # only the exposed columns, password and otp never leave the db
+    return (await db.execute(select(*USER_COLUMNS))).all()
 
 
 
-@router.get('/users/{user_id}')
-def get_user(user_id: int, db: Session = Depends(get_db), current_user: dict = Depends(required_role('admin'))):
+@router.get('/users/{user_id}', response_model=UserOut)
+async def get_user(user_id: int, db: AsyncSession = Depends(get_db), current_user: dict = Depends(required_role('admin'))):
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = (await db.execute(select(*USER_COLUMNS).where(User.id == user_id))).first()
     
     if not user:
         raise HTTPException(status_code=404, detail="user not find")
@@ -34,26 +41,29 @@ def get_user(user_id: int, db: Session = Depends(get_db), current_user: dict = D
 @router.post("/create-user")
 async def admin_create_user(
     user: RegistorUsers,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(required_role("admin"))
 ):
     
-    existing_user = db.query(User).filter(User.email == user.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == user.email))
     
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already exists")
+    
+    # release the connection, then hash only for a request that can still succeed
+    await db.commit()
+    password = await password_hasher.hash(user.password)
 
     new_user = User(
         username=user.username,
         email=user.email,
-        password=hashed_password(user.password),
+        password=password,
         role="user"
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    
+    # flush assigns the user id inside the same transaction as the notification
+    await db.flush()
     
     notification_meassage = Notification(
         user_id = new_user.id,
@@ -61,12 +71,14 @@ async def admin_create_user(
     )
     
     db.add(notification_meassage)
-    db.commit()
-    db.refresh(notification_meassage)
+    await db.commit()
     
     await manager.send_to_user(
         user_id=new_user.id,
-        message="User created by admin"
+        message="User created by admin",
+        event="user.created",
+        entity_id=new_user.id,
+        notification_id=notification_meassage.id
     )
     
     return {"message": "User created by admin"}
@@ -75,18 +87,22 @@ async def admin_create_user(
 
 
 @router.delete("/delete-user")
-def admin_delete_user(
+async def admin_delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(required_role("admin"))
 ):
-    existing_user = db.query(User).filter(User.id == user_id).first()
+    existing_user = await db.scalar(select(User).where(User.id == user_id))
     
     if not existing_user:
         raise HTTPException(status_code=404, detail='user not found')
     
-    db.delete(existing_user)
-    db.commit()
+    await db.delete(existing_user)
+    # the deleted user's tokens must not outlive the account
+    revocation_store.revoke_user(db, existing_user.id)
+    await db.commit()
+    # the user's tasks lose their owner
+    invalidate_tasks(existing_user.id)
 
     return {"message": "User deleted by admin"}
     
@@ -1,13 +1,18 @@
 import os
-from fastapi import HTTPException, Depends, status
+import time
+import uuid
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+from fastapi import HTTPException, Depends, WebSocket, WebSocketException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
 import bcrypt
 from random import randint
 from dotenv import load_dotenv
 
-from app.db.dependency import get_db
+from app.core.config import TOKEN_CACHE_SIZE, TOKEN_CACHE_MAX_TTL
+from app.core.revocation import RevocationStore
 
 # load env FIRST
 load_dotenv()
@@ -24,45 +29,122 @@ if not SECRET_KEY:
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login") 
 http_bearer = HTTPBearer()
 
+revocation_store = RevocationStore(token_lifetime=ACCESS_TOKEN_EXPIRE_HOURS * 3600)
+
+
 def create_token(data: dict):
     to_encode = data.copy()
+    # iat is compared with revocation watermarks, jti lets a single token be revoked
+    to_encode.setdefault("iat", time.time())
+    to_encode.setdefault("jti", uuid.uuid4().hex)
     token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return token
 
 
 
 
+class TokenCache:
+    # verified claims keyed by a digest of the token, so raw tokens are never kept in memory
+    def __init__(self, max_size: int, max_ttl: float):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> dict | None:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            self._entries.pop(key, None)
+            return None
+
+        self._entries.move_to_end(key)
+        return claims
+
+    def put(self, token: str, claims: dict, exp: float | None):
+        expires_at = time.time() + self.max_ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+
+        key = self._key(token)
+        self._entries[key] = (claims, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+token_cache = TokenCache(max_size=TOKEN_CACHE_SIZE, max_ttl=TOKEN_CACHE_MAX_TTL)
+
+
 # it used to get the current user from the token
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(http_bearer),
-    db: Session = Depends(get_db)):
-    
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"Authenticate": "Bearer"},
-    )
+def verify_token(token: str) -> dict | None:
+    # shared by the http bearer dependency and the websocket handshake
+    # hot path: the signature was already verified for this exact token
+    cached = token_cache.get(token)
+    if cached is not None:
+        return None if revocation_store.is_revoked(cached) else cached
 
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("user_id")
-        email = payload.get("email")
-        username = payload.get("username")
-        role = payload.get("role")
-        
-        if email is None or user_id is None or username is None or role is None:
-            raise credentials_exception
-        
-        return {
-            "user_id": user_id,
-            "email": email,
-            "username": username,
-            "role": role
-        }
-    
     except JWTError:
-        raise credentials_exception
+        return None
+
+    user_id = payload.get("user_id")
+    email = payload.get("email")
+    username = payload.get("username")
+    role = payload.get("role")
+    
+    if email is None or user_id is None or username is None or role is None:
+        return None
+    
+    current_user = {
+        "user_id": user_id,
+        "email": email,
+        "username": username,
+        "role": role,
+        "jti": payload.get("jti"),
+        "iat": payload.get("iat", 0),
+        "exp": payload.get("exp")
+    }
+
+    if revocation_store.is_revoked(current_user):
+        return None
+
+    token_cache.put(token, current_user, payload.get("exp"))
+    return current_user
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(http_bearer)):
+    
+    current_user = verify_token(credentials.credentials)
+    if current_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"Authenticate": "Bearer"},
+        )
+    return current_user
+
+
+async def get_websocket_user(websocket: WebSocket, token: Optional[str] = None):
+    # browsers cannot set headers on a websocket, so the token may also come as ?token=
+    if token is None:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else None
+
+    current_user = verify_token(token) if token else None
+    if current_user is None:
+        # raised before accept(), the handshake is refused
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Could not validate credentials")
+    return current_user
     
 
 
@@ -84,7 +166,7 @@ def verify_password(plain: str, hashed: str) -> bool:
 
 
 def required_role(required_role: str):
-    def role_checker(current_user: dict = Depends(get_current_user)):
+    async def role_checker(current_user: dict = Depends(get_current_user)):
         if current_user['role'] != required_role:
             raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,86 @@
+import hashlib
+import time
+from collections import OrderedDict, defaultdict
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.core.config import TASK_CACHE_MAX_ENTRIES, TASK_CACHE_TTL
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or etag.removeprefix("W/") in tags
+
+
+class ResponseCache:
+    # rendered list responses per scope, invalidated by bumping the scope's version on every write
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._versions: dict[str, int] = defaultdict(int)
+        self._entries: OrderedDict[tuple, tuple[int, float, bytes, str]] = OrderedDict()
+        # callables that carry a write's scopes to the other workers, e.g. the notification broker
+        self.publishers = []
+
+    def bump(self, *scopes: str):
+        for scope in scopes:
+            self._versions[scope] += 1
+
+    def invalidate(self, *scopes: str):
+        # local first so this worker never serves the old page, the ttl only covers a lost publish
+        self.bump(*scopes)
+        for publish in self.publishers:
+            publish(scopes)
+
+    def _get(self, key: tuple, scope: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        version, stored_at, body, etag = entry
+        if version != self._versions[scope] or time.monotonic() - stored_at > self.ttl:
+            self._entries.pop(key, None)
+            return None
+
+        self._entries.move_to_end(key)
+        return body, etag
+
+    def _put(self, key: tuple, scope: str, body: bytes, etag: str):
+        self._entries[key] = (self._versions[scope], time.monotonic(), body, etag)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def respond(self, request: Request, scope: str, params: tuple, build) -> Response:
+        key = (scope, params)
+        if_none_match = request.headers.get("if-none-match")
+
+        cached = self._get(key, scope)
+        if cached is None:
+            # version is read before building so a write during the query invalidates the result
+            version = self._versions[scope]
+            page = await build()
+            # response models serialize straight to json bytes in pydantic-core
+            body = page.model_dump_json().encode() if isinstance(page, BaseModel) else JSONResponse(content=page).body
+            # content hash etags stay valid across workers and across cache expiry
+            etag = 'W/"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+            if version == self._versions[scope]:
+                self._put(key, scope, body, etag)
+        else:
+            body, etag = cached
+
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if _matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+task_cache = ResponseCache(max_entries=TASK_CACHE_MAX_ENTRIES, ttl=TASK_CACHE_TTL)
+
+
+def invalidate_tasks(*user_ids):
+    # the owner's own listing and every admin listing can contain the changed task
+    task_cache.invalidate("admin", *(f"user:{user_id}" for user_id in user_ids if user_id is not None))
@@ -7,3 +7,81 @@ SMTP_EMAIL = os.getenv("SMTP_EMAIL")       # your Gmail
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD") # your app password
 SMTP_SERVER = "smtp.gmail.com"
 SMTP_PORT = 587 # TLS = modern, secure port
+
+
+# password hashing pool (bcrypt runs outside the event loop)
+HASH_POOL_KIND = os.getenv("HASH_POOL_KIND", "thread")   # thread or process
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", "4"))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "64"))  # pending hashes before we answer 503
+
+# list endpoints
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+# admin exports
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+# database connection pool (per worker)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))     # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))     # seconds, -1 disables
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# real-time notification fan-out between workers: memory (single process) or postgres (LISTEN/NOTIFY)
+NOTIFY_BACKEND = os.getenv("NOTIFY_BACKEND", "memory")
+NOTIFY_CHANNEL = os.getenv("NOTIFY_CHANNEL", "app_notifications")
+
+# websocket delivery
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))  # pending frames per socket before it is dropped as too slow
+NOTIFY_COALESCE_WINDOW = float(os.getenv("NOTIFY_COALESCE_WINDOW", "0"))  # seconds to batch a user's messages into one frame, 0 disables
+NOTIFY_COALESCE_MAX = int(os.getenv("NOTIFY_COALESCE_MAX", "50"))          # a full batch is sent before its window ends
+NOTIFY_REPLAY_BATCH = int(os.getenv("NOTIFY_REPLAY_BATCH", "200"))          # missed notifications sent per frame on reconnect
+NOTIFY_REPLAY_MAX = int(os.getenv("NOTIFY_REPLAY_MAX", "1000"))              # larger backlogs get a resync event instead of a replay
+NOTIFY_REPLAY_DEDUPE_WINDOW = float(os.getenv("NOTIFY_REPLAY_DEDUPE_WINDOW", "10"))  # seconds replayed ids are remembered once live delivery starts
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))  # seconds between keep-alive comments on an idle event stream
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "20"))   # seconds between protocol pings sent by the server
+WS_PING_TIMEOUT = float(os.getenv("WS_PING_TIMEOUT", "20"))     # seconds to wait for the pong before dropping the socket
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "0"))      # seconds without a client frame before reaping, 0 disables,
+                                                                # quiet sockets are sent a "ping" frame halfway and must reply
+WS_REAP_INTERVAL = float(os.getenv("WS_REAP_INTERVAL", "30"))   # seconds between sweeps for stale connections, keep well under WS_IDLE_TIMEOUT / 2
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "10000"))              # per worker, websockets and event streams together
+WS_MAX_CONNECTIONS_PER_USER = int(os.getenv("WS_MAX_CONNECTIONS_PER_USER", "10"))
+
+# cached unread notification counts
+UNREAD_COUNT_MAX_USERS = int(os.getenv("UNREAD_COUNT_MAX_USERS", "100000"))
+UNREAD_COUNT_TTL = float(os.getenv("UNREAD_COUNT_TTL", "30"))  # seconds before a count is re-read, covers writes from other workers
+
+# batch task endpoints
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "1000"))
+
+# verified token cache
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_MAX_TTL = float(os.getenv("TOKEN_CACHE_MAX_TTL", "300"))  # seconds, also bounds tokens without exp
+
+# token revocation
+REVOCATION_SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL", "5"))  # seconds between reloads from the db
+
+# login throttling, checked before any db query or bcrypt work
+LOGIN_RATE_LIMIT_PER_EMAIL = int(os.getenv("LOGIN_RATE_LIMIT_PER_EMAIL", "5"))   # attempts per window
+LOGIN_RATE_LIMIT_PER_IP = int(os.getenv("LOGIN_RATE_LIMIT_PER_IP", "20"))
+LOGIN_RATE_LIMIT_WINDOW = float(os.getenv("LOGIN_RATE_LIMIT_WINDOW", "60"))     # seconds
+LOGIN_RATE_LIMIT_MAX_KEYS = int(os.getenv("LOGIN_RATE_LIMIT_MAX_KEYS", "100000"))
+LOGIN_RATE_LIMIT_BACKEND = os.getenv("LOGIN_RATE_LIMIT_BACKEND", "memory")       # memory or redis
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# slow query log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_EXPLAIN_SAMPLE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE", "0.1"))  # share of slow SELECTs that get an EXPLAIN
+SLOW_QUERY_MAX_STATEMENTS = int(os.getenv("SLOW_QUERY_MAX_STATEMENTS", "500"))   # distinct statements kept in the report
+
+# task list response cache
+TASK_CACHE_MAX_ENTRIES = int(os.getenv("TASK_CACHE_MAX_ENTRIES", "10000"))
+TASK_CACHE_TTL = float(os.getenv("TASK_CACHE_TTL", "30"))  # seconds, bounds staleness from writes on other workers
+
+# response compression, levels trade cpu for bandwidth
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))  # bytes, smaller bodies are sent as they are
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))        # 1-9
+BROTLI_LEVEL = int(os.getenv("BROTLI_LEVEL", "4"))    # 0-11, used when brotli is installed
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))        # 1-22, used when zstandard is installed
+WS_PER_MESSAGE_DEFLATE = os.getenv("WS_PER_MESSAGE_DEFLATE", "true").lower() in ("1", "true", "yes")
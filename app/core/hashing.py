@@ -0,0 +1,64 @@
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import HTTPException, status
+
+from app.core.auth import hashed_password, verify_password
+from app.core.config import HASH_POOL_KIND, HASH_POOL_WORKERS, HASH_QUEUE_LIMIT
+
+
+class PasswordHasher:
+    def __init__(self, kind: str = "thread", workers: int = 4, queue_limit: int = 64):
+        if kind not in ("thread", "process"):
+            raise RuntimeError("HASH_POOL_KIND must be thread or process")
+
+        self.kind = kind
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self._executor: Executor | None = None
+
+    def _get_executor(self) -> Executor:
+        # created lazily so importing this module never forks or spawns threads
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    async def _run(self, func, *args):
+        # pending counts both running and queued jobs, so the limit bounds latency too
+        if self.pending >= self.queue_limit:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again",
+                headers={"Retry-After": "1"}
+            )
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, plain: str) -> str:
+        return await self._run(hashed_password, plain)
+
+    async def verify(self, plain: str, hashed: str) -> bool:
+        return await self._run(verify_password, plain, hashed)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    kind=HASH_POOL_KIND,
+    workers=HASH_POOL_WORKERS,
+    queue_limit=HASH_QUEUE_LIMIT
+)
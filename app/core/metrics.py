@@ -0,0 +1,176 @@
+import re
+import time
+from collections import OrderedDict, defaultdict
+from contextvars import ContextVar
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.routing import compile_path
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time", "route")
+
+    def __init__(self, route: str):
+        self.queries = 0
+        self.db_time = 0.0
+        self.route = route
+
+
+# set by the middleware for the lifetime of one request, read by the engine events
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    def __init__(self):
+        self.latency: dict[tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.requests: dict[tuple[str, str, int], int] = defaultdict(int)
+        self.in_flight: dict[tuple[str, str], int] = defaultdict(int)
+        self.db_queries: dict[tuple[str, str], int] = defaultdict(int)
+        self.db_time: dict[tuple[str, str], float] = defaultdict(float)
+        # extra lines appended by other subsystems, e.g. websocket counters
+        self.collectors = []
+
+    def observe(self, method: str, route: str, status_code: int, seconds: float, stats: RequestStats):
+        key = (method, route)
+        self.latency[key].observe(seconds)
+        self.requests[(method, route, status_code)] += 1
+        self.db_queries[key] += stats.queries
+        self.db_time[key] += stats.db_time
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), hist in list(self.latency.items()):
+            labels = f'method="{_label(method)}",route="{_label(route)}"'
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {hist.count}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {hist.sum}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {hist.count}")
+
+        lines += ["# HELP http_requests_total Finished requests by route and status", "# TYPE http_requests_total counter"]
+        for (method, route, status_code), count in list(self.requests.items()):
+            lines.append(f'http_requests_total{{method="{_label(method)}",route="{_label(route)}",status="{status_code}"}} {count}')
+
+        lines += ["# HELP http_requests_in_flight Requests currently being handled", "# TYPE http_requests_in_flight gauge"]
+        for (method, route), count in list(self.in_flight.items()):
+            lines.append(f'http_requests_in_flight{{method="{_label(method)}",route="{_label(route)}"}} {count}')
+
+        lines += ["# HELP db_queries_total Queries issued while handling a route", "# TYPE db_queries_total counter"]
+        for (method, route), count in list(self.db_queries.items()):
+            lines.append(f'db_queries_total{{method="{_label(method)}",route="{_label(route)}"}} {count}')
+
+        lines += ["# HELP db_query_seconds_total Time spent in queries while handling a route", "# TYPE db_query_seconds_total counter"]
+        for (method, route), seconds in list(self.db_time.items()):
+            lines.append(f'db_query_seconds_total{{method="{_label(method)}",route="{_label(route)}"}} {seconds}')
+
+        for collector in self.collectors:
+            lines.extend(collector())
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def instrument_engine(engine):
+    # engine is the sync engine behind the AsyncEngine, cursor events fire inside its greenlet
+    # which shares the request's context, so request_stats is visible here
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        stats = request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    def __init__(self, app, openapi, max_cached_paths: int = 10000):
+        self.app = app
+        # route templates are taken from the openapi schema, which lists full paths with their
+        # router prefixes no matter how the routers were nested
+        self.openapi = openapi
+        self.max_cached_paths = max_cached_paths
+        self._templates: list[tuple[re.Pattern, str]] | None = None
+        self._routes: OrderedDict[str, str] = OrderedDict()
+
+    def route_template(self, scope) -> str:
+        # label by route template, not raw path, so ids do not explode the series count
+        path = scope["path"]
+        template = self._routes.get(path)
+        if template is not None:
+            return template
+
+        if self._templates is None:
+            self._templates = [(compile_path(p)[0], p) for p in self.openapi()["paths"]]
+
+        template = next((t for regex, t in self._templates if regex.match(path)), "unmatched")
+
+        self._routes[path] = template
+        if len(self._routes) > self.max_cached_paths:
+            self._routes.popitem(last=False)
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self.route_template(scope)
+        stats = RequestStats(route)
+        token = request_stats.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+        metrics.in_flight[(method, route)] += 1
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = (time.perf_counter() - started) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'app;dur={elapsed:.2f}, db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries"'
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            metrics.in_flight[(method, route)] -= 1
+            metrics.observe(method, route, status_code, time.perf_counter() - started, stats)
+            request_stats.reset(token)
@@ -0,0 +1,118 @@
+import math
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, Request, status
+
+from app.core.config import (
+    LOGIN_RATE_LIMIT_PER_EMAIL,
+    LOGIN_RATE_LIMIT_PER_IP,
+    LOGIN_RATE_LIMIT_WINDOW,
+    LOGIN_RATE_LIMIT_MAX_KEYS,
+    LOGIN_RATE_LIMIT_BACKEND,
+    REDIS_URL,
+)
+
+
+class MemoryBuckets:
+    # token buckets refilled continuously, so the limit slides with time instead of resetting per window
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, capacity: int, window: float) -> float:
+        # returns 0 when allowed, otherwise the seconds until one attempt is available again
+        rate = capacity / window
+        now = time.monotonic()
+
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / rate
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        # the least recently used keys are the ones closest to a full bucket anyway
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+        return wait
+
+
+class RedisBuckets:
+    # same bucket shared by every worker, updated atomically in redis
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate))
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("LOGIN_RATE_LIMIT_BACKEND=redis needs the redis package installed")
+
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    async def take(self, key: str, capacity: int, window: float) -> float:
+        wait = await self._script(keys=[f"ratelimit:{key}"], args=[capacity, capacity / window, time.time()])
+        return float(wait)
+
+
+def create_buckets():
+    if LOGIN_RATE_LIMIT_BACKEND == "memory":
+        return MemoryBuckets(max_keys=LOGIN_RATE_LIMIT_MAX_KEYS)
+
+    if LOGIN_RATE_LIMIT_BACKEND == "redis":
+        return RedisBuckets(REDIS_URL)
+
+    raise RuntimeError("LOGIN_RATE_LIMIT_BACKEND must be memory or redis")
+
+
+class LoginThrottle:
+    def __init__(self, buckets, per_email: int, per_ip: int, window: float):
+        self.buckets = buckets
+        self.per_email = per_email
+        self.per_ip = per_ip
+        self.window = window
+
+    async def check(self, request: Request, email: str):
+        client_ip = request.client.host if request.client else "unknown"
+
+        wait = max(
+            await self.buckets.take(f"ip:{client_ip}", self.per_ip, self.window),
+            await self.buckets.take(f"email:{email.lower()}", self.per_email, self.window),
+        )
+
+        if wait > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many attempts, please try again later",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+
+login_throttle = LoginThrottle(
+    create_buckets(),
+    per_email=LOGIN_RATE_LIMIT_PER_EMAIL,
+    per_ip=LOGIN_RATE_LIMIT_PER_IP,
+    window=LOGIN_RATE_LIMIT_WINDOW
+)
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import SessionLocal
+from app.model.revocation import TokenRevocation
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationStore:
+    # in-memory mirror of token_revocations, checked on every request without a db round-trip
+    def __init__(self, token_lifetime: float):
+        self.token_lifetime = token_lifetime
+        self._not_before: dict[int, tuple[float, float]] = {}   # user_id -> (not_before, expires_at)
+        self._denied: dict[str, float] = {}                     # jti -> expires_at
+
+    def is_revoked(self, claims: dict) -> bool:
+        now = time.time()
+
+        jti = claims.get("jti")
+        if jti is not None:
+            expires_at = self._denied.get(jti)
+            if expires_at is not None:
+                if expires_at > now:
+                    return True
+                self._denied.pop(jti, None)
+
+        watermark = self._not_before.get(claims["user_id"])
+        if watermark is not None:
+            not_before, expires_at = watermark
+            if expires_at <= now:
+                self._not_before.pop(claims["user_id"], None)
+            elif claims.get("iat", 0) < not_before:
+                return True
+
+        return False
+
+    def _apply(self, row: TokenRevocation):
+        # revocations only ever widen, so rows can be merged in any order
+        if row.jti is not None:
+            self._denied[row.jti] = max(self._denied.get(row.jti, 0), row.expires_at)
+
+        if row.user_id is not None and row.not_before is not None:
+            current = self._not_before.get(row.user_id)
+            if current is None or current[0] < row.not_before:
+                self._not_before[row.user_id] = (row.not_before, row.expires_at)
+
+    def revoke_user(self, db: AsyncSession, user_id: int):
+        # saved with the caller's transaction, applied locally right away
+        now = time.time()
+        row = TokenRevocation(user_id=user_id, not_before=now, expires_at=now + self.token_lifetime)
+        db.add(row)
+        self._apply(row)
+
+    def revoke_token(self, db: AsyncSession, jti: str, exp: float | None):
+        expires_at = float(exp) if exp is not None else time.time() + self.token_lifetime
+        row = TokenRevocation(jti=jti, expires_at=expires_at)
+        db.add(row)
+        self._apply(row)
+
+    def _prune(self, now: float):
+        self._denied = {jti: exp for jti, exp in self._denied.items() if exp > now}
+        self._not_before = {uid: wm for uid, wm in self._not_before.items() if wm[1] > now}
+
+    async def sync(self):
+        # the table only holds rows younger than one token lifetime, so a full reload stays small
+        now = time.time()
+        async with SessionLocal() as db:
+            rows = await db.scalars(select(TokenRevocation).where(TokenRevocation.expires_at > now))
+            for row in rows:
+                self._apply(row)
+
+            await db.execute(delete(TokenRevocation).where(TokenRevocation.expires_at <= now))
+            await db.commit()
+
+        self._prune(now)
+
+    async def run(self, interval: float):
+        # picks up revocations made by other workers
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("Syncing token revocations failed")
@@ -0,0 +1,21 @@
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def keyset_page(db: AsyncSession, stmt: Select, key_column, cursor: int | None, limit: int,
+                      descending: bool = False):
+    # rows strictly after the cursor, ordered by the key, one extra row tells us if there is a next page
+    if cursor is not None:
+        stmt = stmt.where(key_column < cursor if descending else key_column > cursor)
+
+    order = key_column.desc() if descending else key_column
+    # statements select plain columns, rows come back without building ORM objects
+    result = await db.execute(stmt.order_by(order).limit(limit + 1))
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = getattr(rows[-1], key_column.key)
+
+    return rows, next_cursor
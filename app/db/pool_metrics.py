@@ -0,0 +1,102 @@
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.closed = 0
+        self.invalidated = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+
+    def record_wait(self, seconds: float):
+        self.wait_count += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def attach(self, engine):
+        pool = engine.pool
+
+        @event.listens_for(pool, "connect")
+        def on_connect(dbapi_conn, record):
+            self.connects += 1
+            # a new physical connection while the pool is full means we are in overflow
+            if isinstance(pool, AsyncAdaptedQueuePool) and pool.overflow() > 0:
+                self.overflow_events += 1
+
+        @event.listens_for(pool, "checkout")
+        def on_checkout(dbapi_conn, record, proxy):
+            self.checkouts += 1
+            record.info["checked_out_at"] = time.perf_counter()
+
+        @event.listens_for(pool, "checkin")
+        def on_checkin(dbapi_conn, record):
+            self.checkins += 1
+            started = record.info.pop("checked_out_at", None)
+            if started is not None:
+                held = time.perf_counter() - started
+                self.hold_total += held
+                self.hold_max = max(self.hold_max, held)
+
+        @event.listens_for(pool, "close")
+        def on_close(dbapi_conn, record):
+            self.closed += 1
+
+        @event.listens_for(pool, "invalidate")
+        def on_invalidate(dbapi_conn, record, exception):
+            self.invalidated += 1
+
+    def snapshot(self, engine) -> dict:
+        pool = engine.pool
+        data = {
+            "pool_class": type(pool).__name__,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "closed": self.closed,
+            "invalidated": self.invalidated,
+            "overflow_events": self.overflow_events,
+            "timeouts": self.timeouts,
+            "wait_count": self.wait_count,
+            "wait_avg_ms": round(self.wait_total / self.wait_count * 1000, 3) if self.wait_count else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "hold_avg_ms": round(self.hold_total / self.checkins * 1000, 3) if self.checkins else 0.0,
+            "hold_max_ms": round(self.hold_max * 1000, 3),
+        }
+
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            data.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+                "timeout": pool.timeout(),
+            })
+
+        return data
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    # pool events only fire once a connection is handed out, so the wait for a free slot is timed here
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - started)
@@ -0,0 +1,106 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# the index is maintained by the database itself (a generated column on postgres, triggers on
+# sqlite), so every insert, update and delete of usertask keeps it in sync, bulk writes included
+
+POSTGRES_SETUP = [
+    """
+    ALTER TABLE usertask ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('english', coalesce(task_name, '') || ' ' || coalesce(task_description, ''))
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_usertask_search_vector ON usertask USING GIN (search_vector)",
+]
+
+SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE usertask_fts USING fts5(
+        task_name, task_description, content='usertask', content_rowid='task_id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS usertask_fts_insert AFTER INSERT ON usertask BEGIN
+        INSERT INTO usertask_fts(rowid, task_name, task_description)
+        VALUES (new.task_id, new.task_name, new.task_description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS usertask_fts_delete AFTER DELETE ON usertask BEGIN
+        INSERT INTO usertask_fts(usertask_fts, rowid, task_name, task_description)
+        VALUES ('delete', old.task_id, old.task_name, old.task_description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS usertask_fts_update AFTER UPDATE ON usertask BEGIN
+        INSERT INTO usertask_fts(usertask_fts, rowid, task_name, task_description)
+        VALUES ('delete', old.task_id, old.task_name, old.task_description);
+        INSERT INTO usertask_fts(rowid, task_name, task_description)
+        VALUES (new.task_id, new.task_name, new.task_description);
+    END
+    """,
+    # index rows that existed before the fts table did
+    "INSERT INTO usertask_fts(usertask_fts) VALUES ('rebuild')",
+]
+
+
+def create_search_index(conn: Connection):
+    # safe to run on every startup, also upgrades databases created before search existed
+    dialect = conn.dialect.name
+
+    if dialect == "postgresql":
+        for statement in POSTGRES_SETUP:
+            conn.execute(text(statement))
+
+    elif dialect == "sqlite":
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'usertask_fts'"
+        )).first()
+        if not exists:
+            for statement in SQLITE_SETUP:
+                conn.execute(text(statement))
+
+
+POSTGRES_SEARCH = text("""
+    SELECT t.task_id, t.task_name, t.task_description, t.task_status,
+           ts_rank(t.search_vector, query) AS rank
+    FROM usertask t, websearch_to_tsquery('english', :q) query
+    WHERE t.user_id = :user_id AND t.search_vector @@ query
+    ORDER BY rank DESC, t.task_id
+    LIMIT :limit OFFSET :offset
+""")
+
+# bm25() is lower for better matches, negated so both backends sort rank descending
+SQLITE_SEARCH = text("""
+    SELECT t.task_id, t.task_name, t.task_description, t.task_status,
+           -bm25(usertask_fts) AS rank
+    FROM usertask_fts
+    JOIN usertask t ON t.task_id = usertask_fts.rowid
+    WHERE usertask_fts MATCH :q AND t.user_id = :user_id
+    ORDER BY rank DESC, t.task_id
+    LIMIT :limit OFFSET :offset
+""")
+
+
+def fts5_query(q: str) -> str:
+    # quote every term so user input can never be parsed as fts5 syntax
+    return " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+
+
+async def search_tasks(db: AsyncSession, q: str, user_id: int, limit: int, offset: int):
+    dialect = db.bind.dialect.name
+
+    if dialect == "postgresql":
+        stmt, query = POSTGRES_SEARCH, q
+    elif dialect == "sqlite":
+        stmt, query = SQLITE_SEARCH, fts5_query(q)
+    else:
+        raise RuntimeError(f"Task search is not supported on {dialect}")
+
+    if not query.strip():
+        return []
+
+    result = await db.execute(stmt, {"q": query, "user_id": user_id, "limit": limit, "offset": offset})
+    return result.all()
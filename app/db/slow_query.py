@@ -0,0 +1,134 @@
+import logging
+import random
+import re
+import time
+from sqlalchemy import event
+
+from app.core.metrics import request_stats
+from app.core.config import SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN_SAMPLE, SLOW_QUERY_MAX_STATEMENTS
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.$])\d+(?:\.\d+)?\b")
+_POSITIONAL = re.compile(r"\$\d+|%\([^)]+\)s|%s|:\w+")
+_SPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\b(IN) \(\?(?:, \?)*\)", re.IGNORECASE)
+_VALUES_ROWS = re.compile(r"(\(\?(?:, \?)*\))(?:, \1)+")
+
+
+def normalize(statement: str) -> str:
+    # same query with different values or IN list lengths collapses to one entry
+    text = _STRING.sub("?", statement)
+    text = _POSITIONAL.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _SPACE.sub(" ", text).strip()
+    text = _IN_LIST.sub(r"\1 (?, ...)", text)
+    return _VALUES_ROWS.sub(r"\1, ...", text)
+
+
+def param_shape(parameters, executemany: bool):
+    # types only, values may hold emails or password hashes
+    if executemany:
+        rows = list(parameters or [])
+        return {"rows": len(rows), "row": param_shape(rows[0], False) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float, explain_sample: float, max_statements: int):
+        self.threshold = threshold_ms / 1000
+        self.explain_sample = explain_sample
+        self.max_statements = max_statements
+        self.entries: dict[str, dict] = {}
+
+    def _explain(self, conn, statement: str, parameters) -> list[str] | None:
+        prefix = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN "}.get(conn.dialect.name)
+        if prefix is None:
+            return None
+
+        # a raw dbapi cursor, so the plan query does not fire engine events or count as app work
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            # runs inside the request's transaction, a failed plan on postgres would abort it,
+            # so it is fenced by a savepoint and rolled back on error
+            cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute(prefix + statement, parameters)
+                plan = [" ".join(str(col) for col in row) for row in cursor.fetchall()]
+            except Exception as exp:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                plan = [f"EXPLAIN failed: {exp}"]
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+            return plan
+        except Exception:
+            logger.exception("Could not fence EXPLAIN with a savepoint")
+            return None
+        finally:
+            cursor.close()
+
+    def record(self, conn, statement: str, parameters, executemany: bool, seconds: float):
+        stats = request_stats.get()
+        route = stats.route if stats is not None else None
+        key = normalize(statement)
+        shape = param_shape(parameters, executemany)
+
+        entry = self.entries.get(key)
+        if entry is None:
+            if len(self.entries) >= self.max_statements:
+                # drop the cheapest statement so the worst offenders always stay
+                cheapest = min(self.entries, key=lambda k: self.entries[k]["total_ms"])
+                self.entries.pop(cheapest)
+            entry = self.entries[key] = {
+                "statement": key,
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "routes": {},
+                "params": shape,
+                "plan": None,
+            }
+
+        ms = seconds * 1000
+        entry["count"] += 1
+        entry["total_ms"] += ms
+        entry["max_ms"] = max(entry["max_ms"], ms)
+        entry["params"] = shape
+        if route is not None:
+            entry["routes"][route] = entry["routes"].get(route, 0) + 1
+
+        is_select = statement.lstrip().upper().startswith("SELECT")
+        if is_select and not executemany and random.random() < self.explain_sample:
+            entry["plan"] = self._explain(conn, statement, parameters)
+
+        logger.warning("Slow query %.1f ms on %s: %s params=%s", ms, route or "-", key, shape)
+
+    def report(self, limit: int) -> list[dict]:
+        ranked = sorted(self.entries.values(), key=lambda e: e["total_ms"], reverse=True)
+        return [
+            {**entry, "total_ms": round(entry["total_ms"], 3), "max_ms": round(entry["max_ms"], 3),
+             "avg_ms": round(entry["total_ms"] / entry["count"], 3)}
+            for entry in ranked[:limit]
+        ]
+
+    def attach(self, engine):
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            seconds = time.perf_counter() - conn.info["slow_query_started"].pop()
+            if seconds >= self.threshold:
+                self.record(conn, statement, parameters, executemany, seconds)
+
+
+slow_query_log = SlowQueryLog(
+    threshold_ms=SLOW_QUERY_MS,
+    explain_sample=SLOW_QUERY_EXPLAIN_SAMPLE,
+    max_statements=SLOW_QUERY_MAX_STATEMENTS
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Index
 from sqlalchemy.sql import func
 from app.db.database import Base
 
@@ -10,4 +10,11 @@ class Notification(Base):
     user_id = Column(Integer, ForeignKey('usersinfo.id'), nullable=False)
     message = Column(String, nullable=False)
     is_read = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # unread filters and counts for one user
+        Index('ix_notifications_user_read_created', 'user_id', 'is_read', 'created_at'),
+        # newest-first keyset pages for one user
+        Index('ix_notifications_user_id_id', 'user_id', 'id'),
+    )
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, Float
+from app.db.database import Base
+
+
+class TokenRevocation(Base):
+    __tablename__ = 'token_revocations'
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # a user watermark row: every token of this user issued before not_before is revoked
+    user_id = Column(Integer, index=True)
+    not_before = Column(Float)
+    # a denylist row: this single token is revoked
+    jti = Column(String, index=True)
+    # epoch seconds after which every affected token has expired anyway
+    expires_at = Column(Float, nullable=False, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum as SAEnum, ForeignKey
+from sqlalchemy import Column, Integer, String, Enum as SAEnum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 
@@ -14,4 +14,11 @@ class Task(Base):
     
     user_id = Column(Integer, ForeignKey('usersinfo.id'))
     
-    user = relationship("User", back_populates="tasks")
\ No newline at end of file
+    user = relationship("User", back_populates="tasks")
+    
+    # keyset pages walk task_id inside each filter, so every filter combination ends with task_id
+    __table_args__ = (
+        Index('ix_usertask_user_id_task_id', 'user_id', 'task_id'),
+        Index('ix_usertask_status_task_id', 'task_status', 'task_id'),
+        Index('ix_usertask_user_id_status_task_id', 'user_id', 'task_status', 'task_id'),
+    )
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import logging
+from sqlalchemy import make_url
+
+from app.core.config import NOTIFY_BACKEND, NOTIFY_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+
+class Broker:
+    # every worker subscribes once with its local delivery callback, publishes reach all workers
+
+    async def start(self, on_message):
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+    async def publish(self, message: dict):
+        raise NotImplementedError
+
+
+class InProcessBroker(Broker):
+    def __init__(self):
+        self._on_message = None
+
+    async def start(self, on_message):
+        self._on_message = on_message
+
+    async def publish(self, message: dict):
+        if self._on_message is not None:
+            await self._on_message(message)
+
+
+class PostgresBroker(Broker):
+    # NOTIFY payloads are capped at 8000 bytes, so only send small envelopes through here
+    def __init__(self, dsn: str, channel: str, reconnect_delay: float = 1.0):
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._on_message = None
+        self._listener = None
+        self._publisher = None
+        self._closing = False
+        self._tasks: set[asyncio.Task] = set()
+
+    async def start(self, on_message):
+        import asyncpg
+
+        self._on_message = on_message
+        self._closing = False
+        self._publisher = await asyncpg.create_pool(self.dsn, min_size=1, max_size=2)
+        await self._listen()
+
+    async def _listen(self):
+        import asyncpg
+
+        self._listener = await asyncpg.connect(self.dsn)
+        self._listener.add_termination_listener(self._on_terminated)
+        await self._listener.add_listener(self.channel, self._on_notify)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning("Dropping malformed notification payload")
+            return
+        self._spawn(self._on_message(message))
+
+    def _on_terminated(self, connection):
+        if not self._closing:
+            self._spawn(self._reconnect())
+
+    async def _reconnect(self):
+        while not self._closing:
+            await asyncio.sleep(self.reconnect_delay)
+            try:
+                await self._listen()
+                return
+            except Exception:
+                logger.exception("Reconnecting notification listener failed")
+
+    async def publish(self, message: dict):
+        payload = json.dumps(message, default=str)
+        await self._publisher.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+
+    async def stop(self):
+        self._closing = True
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+        if self._publisher is not None:
+            await self._publisher.close()
+            self._publisher = None
+        for task in list(self._tasks):
+            task.cancel()
+
+
+def asyncpg_dsn(url: str) -> str:
+    # asyncpg wants a plain postgresql:// dsn without the sqlalchemy driver suffix
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def create_broker() -> Broker:
+    if NOTIFY_BACKEND == "memory":
+        return InProcessBroker()
+
+    if NOTIFY_BACKEND == "postgres":
+        from app.db.database import DATABASE_URL
+        return PostgresBroker(asyncpg_dsn(DATABASE_URL), NOTIFY_CHANNEL)
+
+    raise RuntimeError("NOTIFY_BACKEND must be memory or postgres")
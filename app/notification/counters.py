@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict, defaultdict
+from sqlalchemy import select, func, event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.model.notification import Notification
+from app.core.config import UNREAD_COUNT_MAX_USERS, UNREAD_COUNT_TTL
+
+
+class UnreadCounter:
+    def __init__(self, max_users: int, ttl: float):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._counts: OrderedDict[int, tuple[int, float]] = OrderedDict()
+
+    async def get(self, db: AsyncSession, user_id: int) -> int:
+        entry = self._counts.get(user_id)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl:
+            self._counts.move_to_end(user_id)
+            return entry[0]
+
+        count = await db.scalar(
+            select(func.count())
+            .select_from(Notification)
+            .where(Notification.user_id == user_id, Notification.is_read == False)
+        )
+        self._store(user_id, count, time.monotonic())
+        return count
+
+    def _store(self, user_id: int, count: int, loaded_at: float):
+        self._counts[user_id] = (max(count, 0), loaded_at)
+        self._counts.move_to_end(user_id)
+        while len(self._counts) > self.max_users:
+            self._counts.popitem(last=False)
+
+    def adjust(self, user_id: int, delta: int):
+        # users we never counted are read from the db on their first request anyway
+        entry = self._counts.get(user_id)
+        if entry is not None:
+            self._store(user_id, entry[0] + delta, entry[1])
+
+    def invalidate(self, user_id: int):
+        self._counts.pop(user_id, None)
+
+
+unread_counter = UnreadCounter(max_users=UNREAD_COUNT_MAX_USERS, ttl=UNREAD_COUNT_TTL)
+
+
+# every ORM write path goes through a session, so pending deltas are collected at flush
+# and only applied once the transaction commits
+@event.listens_for(Session, "before_flush")
+def _collect_unread_deltas(session, flush_context, instances):
+    deltas = session.info.setdefault("unread_deltas", defaultdict(int))
+
+    for obj in session.new:
+        if isinstance(obj, Notification) and not obj.is_read:
+            deltas[obj.user_id] += 1
+
+    for obj in session.dirty:
+        if isinstance(obj, Notification):
+            history = inspect(obj).attrs.is_read.history
+            if history.has_changes():
+                was_read = bool(history.deleted[0]) if history.deleted else False
+                if was_read != bool(obj.is_read):
+                    deltas[obj.user_id] += -1 if obj.is_read else 1
+
+    for obj in session.deleted:
+        if isinstance(obj, Notification) and not obj.is_read:
+            deltas[obj.user_id] -= 1
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_unread_deltas(session):
+    for user_id, delta in session.info.pop("unread_deltas", {}).items():
+        if delta:
+            unread_counter.adjust(user_id, delta)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_unread_deltas(session, previous_transaction):
+    session.info.pop("unread_deltas", None)
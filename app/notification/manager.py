@@ -1,27 +1,459 @@
-from fastapi import WebSocket, WebSocketDisconnect,APIRouter
+import asyncio
+import json
+import logging
+import time
+from datetime import timezone
+from fastapi import WebSocket, WebSocketDisconnect,APIRouter, status
+from starlette.websockets import WebSocketState
+from sqlalchemy import select
 # from fastapi.responses import HTMLResponse
 
+from app.db.database import SessionLocal
+from app.core.cache import task_cache
+from app.model.notification import Notification
+from app.notification.broker import Broker, create_broker
+from app.core.config import (WS_SEND_QUEUE_SIZE, NOTIFY_COALESCE_WINDOW, NOTIFY_COALESCE_MAX, NOTIFY_REPLAY_BATCH,
+                             NOTIFY_REPLAY_MAX, NOTIFY_REPLAY_DEDUPE_WINDOW,
+                             WS_MAX_CONNECTIONS, WS_MAX_CONNECTIONS_PER_USER, WS_IDLE_TIMEOUT)
+
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
+
+class Connection:
+    # one socket with its own bounded send queue, drained by its own task
+    def __init__(self, user_id: int, websocket: WebSocket, queue_size: int, structured: bool = False):
+        self.user_id = user_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue[dict | list[dict]] = asyncio.Queue(maxsize=queue_size)
+        self.sender: asyncio.Task | None = None
+        # resuming clients get json arrays of payloads so they can track the notification id
+        self.structured = structured
+        # ids sent by the reconnect replay, ids are assigned at insert but become visible at commit,
+        # so a lower id may still arrive live after the replay and must not be treated as seen
+        self.replayed: set[int] = set()
+        self.replay_timer: asyncio.TimerHandle | None = None
+        self.last_seen = time.monotonic()
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def is_stale(self, now: float, idle_timeout: float) -> bool:
+        # the receive loop or a failed send may have seen the socket go without reaching disconnect
+        if self.sender is not None and self.sender.done():
+            return True
+        if self.websocket.client_state == WebSocketState.DISCONNECTED:
+            return True
+        if self.websocket.application_state == WebSocketState.DISCONNECTED:
+            return True
+        return bool(idle_timeout) and now - self.last_seen > idle_timeout
+
+    def needs_ping(self, now: float, idle_timeout: float) -> bool:
+        # protocol pongs never reach the app, so quiet sockets are asked to answer before they are reaped
+        return bool(idle_timeout) and now - self.last_seen > idle_timeout / 2
+
+    def enqueue(self, item: dict | list[dict]) -> bool:
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def render(self, item: dict | list[dict]) -> str | None:
+        # a row the replay already sent may also be published live, each id is only skipped once
+        batch = []
+        for payload in [item] if isinstance(item, dict) else item:
+            if payload["id"] in self.replayed:
+                self.replayed.discard(payload["id"])
+            else:
+                batch.append(payload)
+        if not batch:
+            return None
+        if isinstance(item, dict) and not self.structured:
+            return item["message"]
+        return self.format(batch)
+
+    def mark_replayed(self, batch: list[dict]):
+        self.replayed.update(p["id"] for p in batch if p["id"] is not None)
+
+    def forget_replayed(self, delay: float):
+        # only rows committed around registration can also arrive live, and they are published right
+        # after their commit, so the ids are dropped shortly after live delivery starts
+        if self.replayed:
+            self.replay_timer = asyncio.get_running_loop().call_later(delay, self.replayed.clear)
+
+    def format(self, batch: list[dict]) -> str:
+        return json.dumps(batch)
+
+    async def send(self, message: str):
+        await self.websocket.send_text(message)
+
+    async def close(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            # the socket may already be gone, nothing left to tell the client
+            pass
+
+
+class StreamConnection(Connection):
+    # a server-sent events client, its response generator drains the queue instead of a sender task
+    START_TIMEOUT = 30.0
+
+    def __init__(self, user_id: int, queue_size: int):
+        super().__init__(user_id, None, queue_size, structured=True)
+        self.started = False
+
+    def is_stale(self, now: float, idle_timeout: float) -> bool:
+        # once running, the response ends and disconnects as soon as the client goes away,
+        # a slot reserved for a response that never started would otherwise be held forever
+        return not self.started and now - self.last_seen > self.START_TIMEOUT
+
+    def needs_ping(self, now: float, idle_timeout: float) -> bool:
+        return False
+
+    def format(self, batch: list[dict]) -> str:
+        # one event per payload, a coalesced batch still goes out in a single write
+        events = []
+        for payload in batch:
+            event_id = f"id: {payload['id']}\n" if payload["id"] is not None else ""
+            events.append(f"{event_id}event: {payload['event']}\ndata: {json.dumps(payload)}\n\n")
+        return "".join(events)
+
+    async def close(self, code: int):
+        # make room for the end marker, anything still queued is dropped with the stream
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: dict[int, WebSocket] = {}
+    def __init__(self, broker: Broker, queue_size: int = 100, coalesce_window: float = 0.0, coalesce_max: int = 50,
+                 replay_batch: int = 200, replay_max: int = 1000, replay_dedupe_window: float = 10.0,
+                 max_connections: int = 10000, max_per_user: int = 10,
+                 idle_timeout: float = 0.0):
+        self.active_connections: dict[int, set[Connection]] = {}
+        self.broker = broker
+        self.queue_size = queue_size
+        # a window of 0 sends every message on its own, as plain text
+        self.coalesce_window = coalesce_window
+        self.coalesce_max = coalesce_max
+        self._pending: dict[int, list[dict]] = {}
+        self._timers: dict[int, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.replay_batch = replay_batch
+        self.replay_max = replay_max
+        self.replay_dedupe_window = replay_dedupe_window
+        self.max_connections = max_connections
+        self.max_per_user = max_per_user
+        # 0 never reaps a socket for silence alone, protocol pings still catch dead peers
+        self.idle_timeout = idle_timeout
+        self.connection_count = 0
+        self.counters = {"opened": 0, "closed": 0, "reaped": 0, "rejected": 0}
+        self._reaper: asyncio.Task | None = None
+
+    async def start(self, reap_interval: float = 30.0):
+        # subscribe once per worker, messages published by any worker come back through _deliver
+        await self.broker.start(self._deliver)
+        self._reaper = asyncio.create_task(self._reap(reap_interval))
+
+    async def stop(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        await self.broker.stop()
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        self._pending.clear()
+        for connection in [c for conns in self.active_connections.values() for c in conns]:
+            self.disconnect(connection)
+            await connection.close(status.WS_1001_GOING_AWAY)
 
-    async def connect(self, user_id: int, websocket: WebSocket):
+    def admit(self, user_id: int) -> bool:
+        if (self.connection_count >= self.max_connections
+                or len(self.active_connections.get(user_id, ())) >= self.max_per_user):
+            self.counters["rejected"] += 1
+            return False
+        return True
+
+    async def connect(self, user_id: int, websocket: WebSocket, last_seen_id: int | None = None) -> Connection | None:
         await websocket.accept()
-        self.active_connections[user_id] = websocket
+        # accepted first so the client gets a close code it can back off on
+        if not self.admit(user_id):
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return None
+
+        connection = Connection(user_id, websocket, self.queue_size, structured=last_seen_id is not None)
+        if last_seen_id is None:
+            return self.register(connection)
+
+        # registered before reading the backlog so nothing published meanwhile is missed,
+        # live messages wait in the queue until the replay is done
+        self.register(connection, start=False)
+        try:
+            async for batch in self._replay(user_id, last_seen_id):
+                await connection.send(connection.format(batch))
+                connection.mark_replayed(batch)
+        except Exception:
+            self.disconnect(connection)
+            raise
+        connection.sender = asyncio.create_task(self._drain(connection))
+        connection.forget_replayed(self.replay_dedupe_window)
+        return connection
+
+    def open_stream(self, user_id: int) -> StreamConnection | None:
+        # the slot is taken here, in the request handler, so concurrent requests cannot all pass the caps
+        if not self.admit(user_id):
+            return None
+        return self.register(StreamConnection(user_id, self.queue_size), start=False)
+
+    async def stream(self, connection: StreamConnection, last_event_id: int | None, heartbeat: float):
+        connection.started = True
+        try:
+            if last_event_id is not None:
+                async for batch in self._replay(connection.user_id, last_event_id):
+                    yield connection.format(batch)
+                    connection.mark_replayed(batch)
+                connection.forget_replayed(self.replay_dedupe_window)
+
+            while True:
+                try:
+                    item = await asyncio.wait_for(connection.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    # comment lines keep proxies from timing out an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if item is None:
+                    return
+                message = connection.render(item)
+                if message is not None:
+                    yield message
+        finally:
+            self.disconnect(connection)
+
+    def register(self, connection: Connection, start: bool = True) -> Connection:
+        self.active_connections.setdefault(connection.user_id, set()).add(connection)
+        self.connection_count += 1
+        self.counters["opened"] += 1
+        if start:
+            connection.sender = asyncio.create_task(self._drain(connection))
+        return connection
+
+    async def _replay(self, user_id: int, last_seen_id: int):
+        missed = (Notification.user_id == user_id, Notification.id > last_seen_id)
+
+        # a backlog past the cap is not replayed at all, the client reloads its pages instead,
+        # the probe stops after replay_max index entries however long the history is
+        async with SessionLocal() as db:
+            overflow = await db.scalar(
+                select(Notification.id).where(*missed).order_by(Notification.id)
+                .offset(self.replay_max).limit(1)
+            )
+        if overflow is not None:
+            yield [{
+                "id": None,
+                "event": "resync",
+                "entity_id": None,
+                "message": "Too many missed notifications, reload them from /notification/me",
+                "ts": time.time()
+            }]
+            return
+
+        cursor = last_seen_id
+        sent = 0
+        while sent < self.replay_max:
+            # a short session per batch, no db connection is held while the client is written to
+            async with SessionLocal() as db:
+                rows = (await db.execute(
+                    select(Notification.id, Notification.message, Notification.created_at)
+                    .where(Notification.user_id == user_id, Notification.id > cursor)
+                    .order_by(Notification.id)
+                    .limit(self.replay_batch)
+                )).all()
+
+            if rows:
+                yield [replay_payload(row) for row in rows]
+                cursor = rows[-1].id
+                sent += len(rows)
+
+            if len(rows) < self.replay_batch:
+                return
+
+    def disconnect(self, connection: Connection):
+        connections = self.active_connections.get(connection.user_id)
+        if connections is not None and connection in connections:
+            connections.discard(connection)
+            self.connection_count -= 1
+            self.counters["closed"] += 1
+            if not connections:
+                self.active_connections.pop(connection.user_id, None)
+
+        if connection.sender is not None and connection.sender is not asyncio.current_task():
+            connection.sender.cancel()
+        if connection.replay_timer is not None:
+            connection.replay_timer.cancel()
+
+    async def _drain(self, connection: Connection):
+        try:
+            while True:
+                message = connection.render(await connection.queue.get())
+                if message is not None:
+                    await connection.send(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # the socket broke mid-send, its receive loop will see the disconnect too
+            self.disconnect(connection)
+
+    async def _reap(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            connections = [c for conns in self.active_connections.values() for c in conns]
+            stale = [c for c in connections if c.is_stale(now, self.idle_timeout)]
+
+            # plain-text clients get "ping", resuming clients a ping event, any reply keeps the socket
+            ping = {"id": None, "event": "ping", "entity_id": None, "message": "ping", "ts": time.time()}
+            for connection in connections:
+                if connection not in stale and connection.needs_ping(now, self.idle_timeout):
+                    connection.enqueue(ping)
+
+            for connection in stale:
+                self.disconnect(connection)
+                self.counters["reaped"] += 1
+                await connection.close(status.WS_1001_GOING_AWAY)
+            if stale:
+                logger.info("Reaped %s stale websocket connections", len(stale))
+
+    def metric_lines(self) -> list[str]:
+        lines = ["# HELP websocket_connections Open notification connections on this worker",
+                 "# TYPE websocket_connections gauge",
+                 f"websocket_connections {self.connection_count}"]
+        for name, count in self.counters.items():
+            lines += [f"# HELP websocket_connections_{name}_total Notification connections {name}",
+                      f"# TYPE websocket_connections_{name}_total counter",
+                      f"websocket_connections_{name}_total {count}"]
+        return lines
+
+    async def _drop_slow(self, connection: Connection):
+        logger.warning("Dropping slow websocket consumer for user %s", connection.user_id)
+        self.disconnect(connection)
+        await connection.close(status.WS_1013_TRY_AGAIN_LATER)
+
+    async def send_to_user(self, user_id: int, message: str, event: str = "message",
+                           entity_id: int | None = None, notification_id: int | None = None):
+        await self._publish({"user_id": user_id, "payload": {
+            "id": notification_id,
+            "event": event,
+            "entity_id": entity_id,
+            "message": message,
+            "ts": time.time()
+        }})
+
+    async def broadcast(self, message: str, event: str = "broadcast"):
+        await self._publish({"user_id": None, "payload": {
+            "id": None,
+            "event": event,
+            "entity_id": None,
+            "message": message,
+            "ts": time.time()
+        }})
+
+    async def _publish(self, envelope: dict):
+        # callers publish after their write committed, a broker failure must not turn that into a 500,
+        # the notification row is still there for /me and the reconnect replay
+        try:
+            await self.broker.publish(envelope)
+        except Exception:
+            logger.exception("Publishing real-time notification for user %s failed", envelope["user_id"])
+
+    async def _deliver(self, envelope: dict):
+        if "invalidate" in envelope:
+            # a write on some worker, the publishing worker already bumped and bumping again is harmless
+            task_cache.bump(*envelope["invalidate"])
+            return
+
+        user_id = envelope.get("user_id")
+        payload = envelope["payload"]
+
+        if user_id is None:
+            user_ids = list(self.active_connections)
+        else:
+            user_ids = [user_id] if user_id in self.active_connections else []
+
+        if not self.coalesce_window:
+            await self._send(user_ids, payload)
+            return
+
+        for target in user_ids:
+            pending = self._pending.setdefault(target, [])
+            pending.append(payload)
+
+            if len(pending) >= self.coalesce_max:
+                await self._flush(target)
+            elif target not in self._timers:
+                # the first message of a burst opens the window, later ones just join it
+                self._timers[target] = asyncio.get_running_loop().call_later(
+                    self.coalesce_window, self._schedule_flush, target
+                )
+
+    def _schedule_flush(self, user_id: int):
+        self._spawn(self._flush(user_id))
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def publish_invalidation(self, scopes):
+        # called from sync write paths, the publish itself never delays the response
+        self._spawn(self._publish({"user_id": None, "invalidate": list(scopes)}))
+
+    async def _flush(self, user_id: int):
+        timer = self._timers.pop(user_id, None)
+        if timer is not None:
+            timer.cancel()
+
+        pending = self._pending.pop(user_id, None)
+        if pending:
+            # the whole burst goes out as one json array frame
+            await self._send([user_id], pending)
+
+    async def _send(self, user_ids: list[int], message: dict | list[dict]):
+        targets = [c for user_id in user_ids for c in self.active_connections.get(user_id, ())]
+
+        # enqueueing never waits, each socket's sender task does the actual I/O concurrently
+        slow = [connection for connection in targets if not connection.enqueue(message)]
+        if slow:
+            await asyncio.gather(*(self._drop_slow(connection) for connection in slow))
 
-    def disconnect(self, user_id: int):
-        self.active_connections.pop(user_id, None)
+def replay_payload(row) -> dict:
+    created_at = row.created_at
+    if created_at is not None and created_at.tzinfo is None:
+        # sqlite hands back naive utc timestamps
+        created_at = created_at.replace(tzinfo=timezone.utc)
 
-    async def send_to_user(self, user_id: int, message: str):
-        websocket = self.active_connections.get(user_id)
-        if websocket:
-            await websocket.send_text(message)
+    return {
+        "id": row.id,
+        "event": "notification",
+        "entity_id": None,
+        "message": row.message,
+        "ts": created_at.timestamp() if created_at is not None else None
+    }
 
-    async def broadcast(self, message: str):
-        for websocket in self.active_connections.values():
-            await websocket.send_text(message)
 
-manager = ConnectionManager()
+manager = ConnectionManager(
+    broker=create_broker(),
+    queue_size=WS_SEND_QUEUE_SIZE,
+    coalesce_window=NOTIFY_COALESCE_WINDOW,
+    coalesce_max=NOTIFY_COALESCE_MAX,
+    replay_batch=NOTIFY_REPLAY_BATCH,
+    replay_max=NOTIFY_REPLAY_MAX,
+    replay_dedupe_window=NOTIFY_REPLAY_DEDUPE_WINDOW,
+    max_connections=WS_MAX_CONNECTIONS,
+    max_per_user=WS_MAX_CONNECTIONS_PER_USER,
+    idle_timeout=WS_IDLE_TIMEOUT
+)
@@ -1,43 +1,103 @@
-from fastapi import WebSocket, WebSocketDisconnect,APIRouter, Depends, HTTPException
-from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
+from fastapi import WebSocket, WebSocketDisconnect, WebSocketException, APIRouter, Depends, HTTPException, Query, Header, status
+from fastapi.responses import HTMLResponse, StreamingResponse
+from typing import Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.notification.manager import manager
 from app.model.notification import Notification
+from app.notification.counters import unread_counter
 from app.db.dependency import get_db
+from app.db.pagination import keyset_page
+from app.schemas.notifications import MarkRead, NotificationOut, NotificationPage
+from app.core.auth import get_current_user, get_websocket_user
+from app.core.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SSE_HEARTBEAT_INTERVAL
 
 router = APIRouter()
 
 
-@router.get('/all')
-def get_all_notif(db: Session = Depends(get_db)):
+NOTIFICATION_COLUMNS = (Notification.id, Notification.user_id, Notification.message,
+                        Notification.is_read, Notification.created_at)
+
+
+@router.get('/all', response_model=list[NotificationOut])
+async def get_all_notif(db: AsyncSession = Depends(get_db)):
     
-    notification = db.query(Notification).all()
+    notification = (await db.execute(select(*NOTIFICATION_COLUMNS))).all()
     
     if not notification:
         raise HTTPException(status_code=404, detail="Notifications not found")
     
+    return notification
+
+
+
+@router.get('/me', response_model=NotificationPage)
+async def my_notifications(cursor: Optional[int] = None,
+                           limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                           unread_only: bool = False,
+                           db: AsyncSession = Depends(get_db),
+                           current_user: dict = Depends(get_current_user)):
+    
+    stmt = select(*NOTIFICATION_COLUMNS).where(Notification.user_id == current_user["user_id"])
+    
+    if unread_only:
+        stmt = stmt.where(Notification.is_read == False)
+    
+    # newest first, the cursor is the last id of the previous page
+    notification, next_cursor = await keyset_page(db, stmt, Notification.id, cursor, limit, descending=True)
+    
+    return NotificationPage(items=notification, next_cursor=next_cursor)
+
+
+
+@router.get('/me/unread-count')
+async def my_unread_count(db: AsyncSession = Depends(get_db),
+                          current_user: dict = Depends(get_current_user)):
+    
+    count = await unread_counter.get(db, current_user["user_id"])
+    return {"unread": count}
+
+
+
+@router.put('/me/read')
+async def mark_many_as_read(data: MarkRead,
+                            db: AsyncSession = Depends(get_db),
+                            current_user: dict = Depends(get_current_user)):
+    
+    user_id = current_user["user_id"]
+    stmt = (
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read == False)
+        .values(is_read=True)
+        # nothing is loaded, so there is nothing in the session to keep in sync
+        .execution_options(synchronize_session=False)
+    )
+    
+    if data.ids is not None:
+        stmt = stmt.where(Notification.id.in_(data.ids))
+    elif data.before_id is not None:
+        stmt = stmt.where(Notification.id < data.before_id)
+    elif data.before is not None:
+        stmt = stmt.where(Notification.created_at < data.before)
+    
+    result = await db.execute(stmt)
+    await db.commit()
+    
+    # bulk updates skip the session hooks, so the cached count is adjusted here
+    unread_counter.adjust(user_id, -result.rowcount)
     
-    return [
-        {
-            'id': notif.id,
-            'user_id': notif.user_id,
-            'message': notif.message,
-            'is_read': notif.is_read,
-            'created_at': notif.created_at
-        }
-        for notif in notification
-    ]
+    return {"updated": result.rowcount}
 
 
 
 @router.put('/{notif_id}/read')
-def mark_as_read(notif_id: int, db: Session = Depends(get_db)):
-    notif = db.query(Notification).filter(Notification.id == notif_id).first()
+async def mark_as_read(notif_id: int, db: AsyncSession = Depends(get_db)):
+    notif = await db.scalar(select(Notification).where(Notification.id == notif_id))
     if not notif:
         return {"error": "Notification not found"}
     notif.is_read = True
-    db.commit()
+    await db.commit()
     return {"message": "Notification marked as read"}
 
 
@@ -47,11 +107,38 @@ async def get():
     return HTMLResponse()
 
 
+@router.get('/stream')
+async def notification_stream(last_event_id: Optional[int] = Header(None, alias="Last-Event-ID"),
+                              current_user: dict = Depends(get_current_user)):
+    
+    connection = manager.open_stream(current_user["user_id"])
+    if connection is None:
+        raise HTTPException(status_code=503, detail="Too many open connections", headers={"Retry-After": "5"})
+    
+    # same fan-out as the websockets, for clients behind proxies that break them
+    return StreamingResponse(
+        manager.stream(connection, last_event_id, SSE_HEARTBEAT_INTERVAL),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+
 @router.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int):
-    await manager.connect(user_id, websocket)
+async def websocket_endpoint(websocket: WebSocket, user_id: int, last_seen_id: Optional[int] = None,
+                             current_user: dict = Depends(get_websocket_user)):
+    # the path id must be the token's own, refused before accept() so nothing is sent or reserved
+    if current_user["user_id"] != user_id:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Permission denied")
+    
+    # reconnecting clients pass the last notification id they saw and get everything after it first
+    connection = await manager.connect(current_user["user_id"], websocket, last_seen_id)
+    if connection is None:
+        return
     try:
         while True:
             await websocket.receive_text()
+            # any client frame, e.g. the answer to a server ping, counts as activity for idle reaping
+            connection.touch()
     except WebSocketDisconnect:
-        manager.disconnect(user_id)
\ No newline at end of file
+        manager.disconnect(connection)
\ No newline at end of file
@@ -1,11 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from typing import Optional
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.model.task import Task
 from app.model.notification import Notification
 from app.db.dependency import get_db
-from app.schemas.tasks import CreateTask, UpdateTask
+from app.db.pagination import keyset_page
+from app.db.search import search_tasks
+from app.schemas.tasks import CreateTask, UpdateTask, TaskStatus, BatchCreateTasks, BatchUpdateTasks, BatchDeleteTasks, TaskPage, TaskSearchPage
+from app.core.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.core.auth import get_current_user, required_role
+from app.core.cache import task_cache, invalidate_tasks
 from app.notification.manager import manager
 
 
@@ -15,10 +22,10 @@ VALID_STATUS = {'pending', 'completed'}
 
 @router.post('/create')
 async def create_task(task: CreateTask,
-                db: Session = Depends(get_db),
+                db: AsyncSession = Depends(get_db),
                 current_user: dict = Depends(get_current_user)):
     
-    existing_task = db.query(Task).filter(Task.task_name == task.task_name).first() 
+    existing_task = await db.scalar(select(Task).where(Task.task_name == task.task_name)) 
     
     if existing_task:
         raise HTTPException(status_code=400, detail="Task already exist")
@@ -34,24 +41,23 @@ async def create_task(task: CreateTask,
         user_id = current_user["user_id"]   
     )
     
-    db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
-    
-    
     notification_meassage = Notification(
         user_id = current_user["user_id"],
         message = "New task created.",
         is_read = False
     )
     
-    db.add(notification_meassage)
-    db.commit()
-    db.refresh(notification_meassage)
+    # task and its notification land in one transaction
+    db.add_all([new_task, notification_meassage])
+    await db.commit()
+    invalidate_tasks(current_user["user_id"])
     
     await manager.send_to_user(
         user_id=current_user["user_id"],
-        message="Task created successfully"
+        message="Task created successfully",
+        event="task.created",
+        entity_id=new_task.task_id,
+        notification_id=notification_meassage.id
     )
     
     return {
@@ -62,25 +68,49 @@ async def create_task(task: CreateTask,
 
 
 
-@router.get('/view')
-def view_task(db: Session = Depends(get_db),
+TASK_COLUMNS = (Task.task_id, Task.task_name, Task.task_description, Task.task_status)
+
+
+@router.get('/view', response_model=TaskPage)
+async def view_task(request: Request,
+              cursor: Optional[int] = None,
+              limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+              task_status: Optional[TaskStatus] = None,
+              db: AsyncSession = Depends(get_db),
               current_user: dict = Depends(get_current_user)):
     
-    tasks = db.query(Task).all()
+    async def build():
+        # users only ever page through their own tasks, fetching just the exposed columns
+        stmt = select(*TASK_COLUMNS).where(Task.user_id == current_user["user_id"])
+        
+        if task_status is not None:
+            stmt = stmt.where(Task.task_status == task_status)
+        
+        tasks, next_cursor = await keyset_page(db, stmt, Task.task_id, cursor, limit)
+        
+        return TaskPage(items=tasks, next_cursor=next_cursor)
+    
+    # served from cache (or 304) until one of the user's tasks changes
+    scope = f"user:{current_user['user_id']}"
+    return await task_cache.respond(request, scope, (cursor, limit, task_status), build)
+
+
+
+
+@router.get('/search', response_model=TaskSearchPage)
+async def search_task(q: str = Query(..., min_length=1, max_length=200),
+              limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+              offset: int = Query(0, ge=0),
+              db: AsyncSession = Depends(get_db),
+              current_user: dict = Depends(get_current_user)):
     
-    if not tasks:
-        raise HTTPException(status_code=404, detail="Task not found")
+    # ranked results cannot be keyset paginated, so pages are limit/offset
+    rows = await search_tasks(db, q, current_user["user_id"], limit, offset)
     
-     # Convert to list of dictionaries for JSON serialization
-    return [
-        {
-            'id': task.task_id,
-            'task_name': task.task_name,
-            'task_description': task.task_description,
-            'task_status': task.task_status
-        }
-        for task in tasks
-    ]
+    return TaskSearchPage(
+        items=rows,
+        next_offset=offset + limit if len(rows) == limit else None
+    )
 
 
 
@@ -88,10 +118,10 @@ def view_task(db: Session = Depends(get_db),
 # update endpoint
 @router.put('/update/{task_id}')
 async def update_task(task_id: int, task_update: UpdateTask,
-                db: Session = Depends(get_db),
+                db: AsyncSession = Depends(get_db),
                 current_user: dict = Depends(get_current_user)):
     
-    existing_task = db.query(Task).filter(Task.task_id == task_id).first()
+    existing_task = await db.scalar(select(Task).where(Task.task_id == task_id))
     
     if not existing_task:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -110,21 +140,21 @@ async def update_task(task_id: int, task_update: UpdateTask,
     for field, value in update_data.items():
         setattr(existing_task, field, value)
     
-    db.commit()
-    db.refresh(existing_task)
-    
     notification_meassage = Notification(
         user_id = current_user["user_id"],
         message = "Task updated."
     )
     
     db.add(notification_meassage)
-    db.commit()
-    db.refresh(notification_meassage)
+    await db.commit()
+    invalidate_tasks(existing_task.user_id)
     
     await manager.send_to_user(
         user_id=current_user["user_id"],
-        message="Task updated successfully"
+        message="Task updated successfully",
+        event="task.updated",
+        entity_id=existing_task.task_id,
+        notification_id=notification_meassage.id
     )
     
     return {
@@ -134,17 +164,14 @@ async def update_task(task_id: int, task_update: UpdateTask,
 
 
 @router.delete('/delete/{task_id}')
-async def delete_task(task_id: int, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+async def delete_task(task_id: int, db: AsyncSession = Depends(get_db), current_user: dict = Depends(get_current_user)):
     
-    existing_task = db.query(Task).filter(Task.task_id == task_id).first()
+    existing_task = await db.scalar(select(Task).where(Task.task_id == task_id))
     
     if not existing_task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    db.delete(existing_task)
-    
-    db.commit()
-    # db.refresh(existing_task)
+    await db.delete(existing_task)
     
     notification_meassage = Notification(
         user_id = current_user["user_id"],
@@ -152,12 +179,196 @@ async def delete_task(task_id: int, db: Session = Depends(get_db), current_user:
     )
     
     db.add(notification_meassage)
-    db.commit()
-    db.refresh(notification_meassage)
+    await db.commit()
+    invalidate_tasks(existing_task.user_id)
     
     await manager.send_to_user(
         user_id=current_user["user_id"],
-        message="Task deleted successfully"
+        message="Task deleted successfully",
+        event="task.deleted",
+        entity_id=task_id,
+        notification_id=notification_meassage.id
     )
     
-    return {"message": "Task successfully deleted"}
\ No newline at end of file
+    return {"message": "Task successfully deleted"}
+
+
+
+
+# batch endpoints: one lookup, one write and one summary notification per request
+@router.post('/batch')
+async def batch_create_tasks(data: BatchCreateTasks,
+                db: AsyncSession = Depends(get_db),
+                current_user: dict = Depends(get_current_user)):
+    
+    names = {task.task_name for task in data.tasks}
+    taken = set(await db.scalars(select(Task.task_name).where(Task.task_name.in_(names))))
+    
+    results = []
+    rows = []
+    for index, task in enumerate(data.tasks):
+        if task.task_name in taken:
+            results.append({"index": index, "status": "error", "detail": "Task already exist"})
+            continue
+        
+        # later duplicates inside the same batch are rejected too
+        taken.add(task.task_name)
+        rows.append({
+            "task_name": task.task_name,
+            "task_description": task.task_description,
+            "task_status": task.task_status,
+            "user_id": current_user["user_id"]
+        })
+        results.append({"index": index, "status": "created"})
+    
+    if rows:
+        try:
+            task_ids = (await db.scalars(
+                insert(Task).returning(Task.task_id, sort_by_parameter_order=True),
+                rows
+            )).all()
+        except IntegrityError:
+            # a concurrent request took one of the names after our lookup
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="Task already exist, retry the batch")
+        
+        created = iter(task_ids)
+        for result in results:
+            if result["status"] == "created":
+                result["task_id"] = next(created)
+        
+        notification = Notification(
+            user_id = current_user["user_id"],
+            message = f"{len(rows)} tasks created."
+        )
+        db.add(notification)
+        await db.commit()
+        invalidate_tasks(current_user["user_id"])
+        
+        await manager.send_to_user(
+            user_id=current_user["user_id"],
+            message=f"{len(rows)} tasks created successfully",
+            event="task.batch_created",
+            notification_id=notification.id
+        )
+    
+    return {"created": len(rows), "results": results}
+
+
+
+@router.put('/batch')
+async def batch_update_tasks(data: BatchUpdateTasks,
+                db: AsyncSession = Depends(get_db),
+                current_user: dict = Depends(get_current_user)):
+    
+    ids = {item.task_id for item in data.tasks}
+    owned = set(await db.scalars(
+        select(Task.task_id).where(Task.task_id.in_(ids), Task.user_id == current_user["user_id"])
+    ))
+    
+    new_names = {item.task_name for item in data.tasks if item.task_name is not None}
+    name_owner = {}
+    if new_names:
+        rows = await db.execute(select(Task.task_name, Task.task_id).where(Task.task_name.in_(new_names)))
+        name_owner = {name: task_id for name, task_id in rows}
+    
+    results = []
+    params = []
+    seen = set()
+    for index, item in enumerate(data.tasks):
+        update_data = item.model_dump(exclude_unset=True)
+        task_id = update_data.pop("task_id")
+        
+        if task_id not in owned or task_id in seen:
+            detail = "Task not found" if task_id not in owned else "Task listed twice"
+            results.append({"index": index, "task_id": task_id, "status": "error", "detail": detail})
+            continue
+        
+        if not update_data:
+            results.append({"index": index, "task_id": task_id, "status": "error", "detail": "No data provide for updata"})
+            continue
+        
+        # explicit nulls survive exclude_unset, and every task column is NOT NULL
+        nulls = sorted(field for field, value in update_data.items() if value is None)
+        if nulls:
+            results.append({"index": index, "task_id": task_id, "status": "error", "detail": f"{', '.join(nulls)} cannot be null"})
+            continue
+        
+        name = update_data.get("task_name")
+        if name is not None and name_owner.get(name, task_id) != task_id:
+            results.append({"index": index, "task_id": task_id, "status": "error", "detail": "Task name already exists"})
+            continue
+        
+        if name is not None:
+            name_owner[name] = task_id
+        seen.add(task_id)
+        params.append({"task_id": task_id, **update_data})
+        results.append({"index": index, "task_id": task_id, "status": "updated"})
+    
+    if params:
+        try:
+            # primary keys in every row make this an executemany UPDATE ... WHERE task_id = ?
+            await db.execute(update(Task), params)
+            
+            notification = Notification(
+                user_id = current_user["user_id"],
+                message = f"{len(params)} tasks updated."
+            )
+            db.add(notification)
+            await db.commit()
+        except IntegrityError:
+            # a concurrent request took one of the names after our lookup
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="Task name already exists, retry the batch")
+        invalidate_tasks(current_user["user_id"])
+        
+        await manager.send_to_user(
+            user_id=current_user["user_id"],
+            message=f"{len(params)} tasks updated successfully",
+            event="task.batch_updated",
+            notification_id=notification.id
+        )
+    
+    return {"updated": len(params), "results": results}
+
+
+
+@router.delete('/batch')
+async def batch_delete_tasks(data: BatchDeleteTasks,
+                db: AsyncSession = Depends(get_db),
+                current_user: dict = Depends(get_current_user)):
+    
+    owned = set(await db.scalars(
+        select(Task.task_id).where(Task.task_id.in_(data.task_ids), Task.user_id == current_user["user_id"])
+    ))
+    
+    results = [
+        {"index": index, "task_id": task_id, "status": "deleted"}
+        if task_id in owned else
+        {"index": index, "task_id": task_id, "status": "error", "detail": "Task not found"}
+        for index, task_id in enumerate(data.task_ids)
+    ]
+    
+    if owned:
+        await db.execute(
+            delete(Task)
+            .where(Task.task_id.in_(owned))
+            .execution_options(synchronize_session=False)
+        )
+        
+        notification = Notification(
+            user_id = current_user["user_id"],
+            message = f"{len(owned)} tasks deleted."
+        )
+        db.add(notification)
+        await db.commit()
+        invalidate_tasks(current_user["user_id"])
+        
+        await manager.send_to_user(
+            user_id=current_user["user_id"],
+            message=f"{len(owned)} tasks deleted successfully",
+            event="task.batch_deleted",
+            notification_id=notification.id
+        )
+    
+    return {"deleted": len(owned), "results": results}
@@ -1,12 +1,15 @@
-from fastapi import HTTPException, Depends, APIRouter
-from sqlalchemy.orm import Session
+from fastapi import HTTPException, Depends, APIRouter, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 
 from app.model.user import User
 from app.model.notification import Notification
 from app.db.dependency import get_db
 from app.schemas.users import RegistorUsers, LoginUser, ChangePassword, ForgetPassword, VerifyOTP
-from app.core.auth import create_token, get_current_user, hashed_password, verify_password, gen_otp
+from app.core.auth import create_token, get_current_user, gen_otp, revocation_store
+from app.core.hashing import password_hasher
+from app.core.ratelimit import login_throttle
 from app.notification.manager import manager
 
 SECRET_KEY = "This is my secret key"
@@ -17,27 +20,30 @@ router = APIRouter()
 
 # register user
 @router.post("/register")
-async def register(user: RegistorUsers, db: Session = Depends(get_db)):
+async def register(user: RegistorUsers, db: AsyncSession = Depends(get_db)):
     
     # fitch data from the database check is user already exist
-    user_exist = db.query(User).filter(User.email == user.email).first()
+    user_exist = await db.scalar(select(User).where(User.email == user.email))
     
     if user_exist:
         raise HTTPException(status_code=400, detail='User already exist in database')
+    
+    # release the connection, then hash only for a request that can still succeed
+    await db.commit()
+    password = await password_hasher.hash(user.password)
 
     # insert data into table
     new_user = User(
        username = user.username,
         email = user.email,
-        password = hashed_password(user.password),
+        password = password,
         role = "user"
     )
     
     # add user record into table
     db.add(new_user)
-    # save data
-    db.commit()
-    db.refresh(new_user)
+    # flush assigns the user id inside the same transaction as the notification
+    await db.flush()
     
     # create notification unread
     notification_meassage = Notification(
@@ -47,12 +53,15 @@ async def register(user: RegistorUsers, db: Session = Depends(get_db)):
     )
     
     db.add(notification_meassage)
-    db.commit()
+    await db.commit()
     
     # send realtime notification
     await manager.send_to_user(
         user_id=new_user.id,
-        message="New user registored successfully"
+        message="New user registored successfully",
+        event="user.registered",
+        entity_id=new_user.id,
+        notification_id=notification_meassage.id
     )
 
     return {
@@ -62,13 +71,19 @@ async def register(user: RegistorUsers, db: Session = Depends(get_db)):
 
 # login route
 @router.post("/login")
-async def login(user: LoginUser, db: Session = Depends(get_db)):
+async def login(user: LoginUser, request: Request, db: AsyncSession = Depends(get_db)):
+
+    # reject floods before they cost a query or a bcrypt round
+    await login_throttle.check(request, user.email)
 
     # find user
-    user_db = db.query(User).filter(User.email == user.email).first()
+    user_db = await db.scalar(select(User).where(User.email == user.email))
+    # end the read so the connection goes back to the pool while bcrypt runs,
+    # expire_on_commit=False keeps user_db loaded
+    await db.commit()
 
     # check password
-    if not user_db or not verify_password(user.password, user_db.password):
+    if not user_db or not await password_hasher.verify(user.password, user_db.password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     # create token
@@ -96,13 +111,15 @@ async def login(user: LoginUser, db: Session = Depends(get_db)):
         )
 
     db.add(notification_message)
-    db.commit()
-    db.refresh(notification_message)
+    await db.commit()
 
     # send realtime notification (only if user is connected)
     await manager.send_to_user(
         user_id=user_db.id,
-        message="Login successful"
+        message="Login successful",
+        event="user.login",
+        entity_id=user_db.id,
+        notification_id=notification_message.id
     )
 
     return {
@@ -114,7 +131,7 @@ async def login(user: LoginUser, db: Session = Depends(get_db)):
 
 
 @router.get('/profile')
-def profile(current_user: dict = Depends(get_current_user)):
+async def profile(current_user: dict = Depends(get_current_user)):
     return {
         "message": "Access granted",
         "user_id": current_user["user_id"],
@@ -126,24 +143,43 @@ def profile(current_user: dict = Depends(get_current_user)):
 
 
 
+# logout revokes only the token used for this request
+@router.post('/logout')
+async def logout(db: AsyncSession = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    
+    if current_user["jti"] is None:
+        raise HTTPException(status_code=400, detail='Token cannot be revoked, login again')
+    
+    revocation_store.revoke_token(db, current_user["jti"], current_user["exp"])
+    await db.commit()
+    
+    return {"message": "Logged out successfully"}
+
+
+
+
 # user change password
 @router.post('/change')
-async def change_password(user: ChangePassword, db: Session = Depends(get_db)):
+async def change_password(user: ChangePassword, request: Request, db: AsyncSession = Depends(get_db)):
+
+    # reject floods before they cost a query or a bcrypt round
+    await login_throttle.check(request, user.email)
 
     # fitch data from database
-    user_db = db.query(User).filter(User.email == user.email).first()
+    user_db = await db.scalar(select(User).where(User.email == user.email))
+    # release the connection before the bcrypt rounds below
+    await db.commit()
 
     # checking for password verification
     if user_db:
-        if not verify_password(user.old_password, user_db.password):
+        if not await password_hasher.verify(user.old_password, user_db.password):
             raise HTTPException(status_code=401, detail='Old password is incorrect')
         
         # make new password hashed
-        user_db.password = hashed_password(user.new_password)
-        
-        # save update in database
-        db.commit()
+        user_db.password = await password_hasher.hash(user.new_password)
         
+        # tokens issued with the old password stop working
+        revocation_store.revoke_user(db, user_db.id)
         
         # save notification (unread)
         notification_message = Notification(
@@ -152,14 +188,17 @@ async def change_password(user: ChangePassword, db: Session = Depends(get_db)):
             is_read=False
         )
 
+        # password and notification are saved in one transaction
         db.add(notification_message)
-        db.commit()
-        db.refresh(notification_message)
+        await db.commit()
 
         # send realtime notification (only if user is connected)
         await manager.send_to_user(
             user_id=user_db.id,
-            message="Password update"
+            message="Password update",
+            event="user.password_changed",
+            entity_id=user_db.id,
+            notification_id=notification_message.id
         )
         
         
@@ -172,9 +211,9 @@ async def change_password(user: ChangePassword, db: Session = Depends(get_db)):
             
 # user forget password
 @router.post('/forget')
-async def forget_password(user: ForgetPassword, db: Session = Depends(get_db)):
+async def forget_password(user: ForgetPassword, db: AsyncSession = Depends(get_db)):
     
-    existing_user = db.query(User).filter(User.email == user.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == user.email))
     
     if not existing_user:
         raise HTTPException(status_code=404, detail='User not found from database')
@@ -184,9 +223,6 @@ async def forget_password(user: ForgetPassword, db: Session = Depends(get_db)):
     # assign otp to existing user
     existing_user.otp = otp
     
-    db.commit()
-    
-    
     # save notification (unread)
     notification_message = Notification(
         user_id=existing_user.id,
@@ -195,13 +231,15 @@ async def forget_password(user: ForgetPassword, db: Session = Depends(get_db)):
     )
 
     db.add(notification_message)
-    db.commit()
-    db.refresh(notification_message)
+    await db.commit()
 
     # send realtime notification (only if user is connected)
     await manager.send_to_user(
         user_id=existing_user.id,
-        message="Password foget successful"
+        message="Password foget successful",
+        event="user.password_reset_requested",
+        entity_id=existing_user.id,
+        notification_id=notification_message.id
     )
     
     return {
@@ -214,9 +252,12 @@ async def forget_password(user: ForgetPassword, db: Session = Depends(get_db)):
 
 # verify otp
 @router.post('/verify-otp')
-async def verify_otp(data: VerifyOTP, db: Session = Depends(get_db)):
+async def verify_otp(data: VerifyOTP, request: Request, db: AsyncSession = Depends(get_db)):
+    
+    # also stops brute forcing the 6 digit otp
+    await login_throttle.check(request, data.email)
     
-    existing_user = db.query(User).filter(User.email == data.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == data.email))
     
     if not existing_user:
         raise HTTPException(status_code=404, detail='User not found from database')
@@ -227,12 +268,15 @@ async def verify_otp(data: VerifyOTP, db: Session = Depends(get_db)):
     if data.otp != existing_user.otp:
         raise HTTPException(status_code=401, detail='Invalid OTP')
     
-    existing_user.password = hashed_password(data.new_password)
+    # release the connection before hashing the new password
+    await db.commit()
     
-    existing_user.otp = None
+    existing_user.password = await password_hasher.hash(data.new_password)
     
-    db.commit()
+    existing_user.otp = None
     
+    # tokens issued with the old password stop working
+    revocation_store.revoke_user(db, existing_user.id)
     
     # save notification (unread)
     notification_message = Notification(
@@ -242,13 +286,15 @@ async def verify_otp(data: VerifyOTP, db: Session = Depends(get_db)):
     )
 
     db.add(notification_message)
-    db.commit()
-    db.refresh(notification_message)
+    await db.commit()
 
     # send realtime notification (only if user is connected)
     await manager.send_to_user(
         user_id=existing_user.id,
-        message="OTP verified successful"
+        message="OTP verified successful",
+        event="user.password_reset",
+        entity_id=existing_user.id,
+        notification_id=notification_message.id
     )
     
     return {
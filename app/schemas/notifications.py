@@ -0,0 +1,32 @@
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+from typing import Optional
+from datetime import datetime
+
+
+class MarkRead(BaseModel):
+    ids: Optional[list[int]] = Field(None, max_length=1000, description='Notification ids to mark as read')
+    before_id: Optional[int] = Field(None, description='Mark every notification with a smaller id')
+    before: Optional[datetime] = Field(None, description='Mark every notification created earlier')
+    all: bool = Field(False, description='Mark every notification')
+    
+    @model_validator(mode='after')
+    def one_selector(self):
+        chosen = [self.ids is not None, self.before_id is not None, self.before is not None, self.all]
+        if sum(chosen) != 1:
+            raise ValueError('Provide exactly one of ids, before_id, before or all')
+        return self
+
+
+class NotificationOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int
+    user_id: Optional[int] = None
+    message: str
+    is_read: Optional[bool] = None
+    created_at: Optional[datetime] = None
+
+
+class NotificationPage(BaseModel):
+    items: list[NotificationOut]
+    next_cursor: Optional[int] = None
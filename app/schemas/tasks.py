@@ -1,8 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ConfigDict, AliasChoices
 from typing import Optional
 
 from enum import Enum
 
+from app.core.config import MAX_BATCH_SIZE
+
 class TaskStatus(str, Enum):
     pending = 'pending'
     completed = 'completed'
@@ -20,5 +22,49 @@ class UpdateTask(BaseModel):
     task_status: Optional[TaskStatus] = None
 
 
+class BatchCreateTasks(BaseModel):
+    tasks: list[CreateTask] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class BatchUpdateItem(UpdateTask):
+    task_id: int
+
+
+class BatchUpdateTasks(BaseModel):
+    tasks: list[BatchUpdateItem] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class BatchDeleteTasks(BaseModel):
+    task_ids: list[int] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class TaskOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int = Field(validation_alias=AliasChoices('task_id', 'id'))
+    task_name: str
+    task_description: str
+    task_status: TaskStatus
+
+
+class AdminTaskOut(TaskOut):
+    user_id: Optional[int] = None
+
+
+class TaskPage(BaseModel):
+    items: list[TaskOut]
+    next_cursor: Optional[int] = None
+
+
+class AdminTaskPage(BaseModel):
+    items: list[AdminTaskOut]
+    next_cursor: Optional[int] = None
+
+
+class TaskSearchHit(TaskOut):
+    rank: float
 
 
+class TaskSearchPage(BaseModel):
+    items: list[TaskSearchHit]
+    next_offset: Optional[int] = None
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Annotated
+from pydantic import BaseModel, EmailStr, Field, ConfigDict
+from typing import Annotated, Optional
 
 class RegistorUsers(BaseModel):
     username: str
@@ -33,4 +33,13 @@ class Profile(BaseModel):
     id: int
     email: EmailStr
     username: str
-    
\ No newline at end of file
+
+
+# never carries password or otp
+class UserOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int
+    username: str
+    email: str
+    role: Optional[str] = None
@@ -0,0 +1,291 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import uuid
+
+from starlette.websockets import WebSocketState
+
+# run from the repo root:
+#   python -m benchmarks.bench run --concurrency 20 --requests 200 --output base.json
+#   python -m benchmarks.bench compare base.json new.json --threshold 0.1
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    # nearest-rank, so every reported value is a latency that really happened
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: list[float], errors: int, wall: float) -> dict:
+    count = len(latencies)
+    return {
+        "count": count,
+        "errors": errors,
+        "throughput_rps": round(count / wall, 2) if wall else 0.0,
+        "mean_ms": round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def drive(total: int, concurrency: int, op) -> dict:
+    # op(i) performs one call and returns True on success
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                ok = await op(i)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+class FakeSocket:
+    # stands in for a client socket so fan-out is measured without a network stack
+    def __init__(self, expected: int):
+        self.received = 0
+        self.expected = expected
+        self.done = asyncio.Event()
+        self.client_state = WebSocketState.CONNECTED
+        self.application_state = WebSocketState.CONNECTED
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self.received += 1
+        if self.received >= self.expected:
+            self.done.set()
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def fanout(manager, sockets: int, messages: int) -> dict:
+    fakes = [FakeSocket(expected=1) for _ in range(sockets)]
+    connections = [await manager.connect(-(i + 1), fake) for i, fake in enumerate(fakes)]
+
+    latencies = []
+    started = time.perf_counter()
+    try:
+        for i in range(messages):
+            for fake in fakes:
+                fake.done.clear()
+                fake.received = 0
+            sent = time.perf_counter()
+            await manager.broadcast(f"bench {i}")
+            await asyncio.gather(*(fake.done.wait() for fake in fakes))
+            latencies.append(time.perf_counter() - sent)
+    finally:
+        for connection in connections:
+            manager.disconnect(connection)
+
+    result = summarize(latencies, 0, time.perf_counter() - started)
+    result["sockets"] = sockets
+    return result
+
+
+async def run_suite(args) -> dict:
+    import httpx
+    from main import app
+    from app.notification.manager import manager
+
+    run_id = uuid.uuid4().hex[:8]
+    password = "bench-password"
+    results = {}
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+            async def register(i):
+                r = await client.post("/users/register", json={
+                    "username": f"bench{i}",
+                    "email": f"bench-{run_id}-{i}@example.com",
+                    "password": password,
+                })
+                return r.status_code == 200
+
+            users = min(args.requests, args.users)
+            results["POST /users/register"] = await drive(users, args.concurrency, register)
+
+            tokens = {}
+
+            async def login(i):
+                r = await client.post("/users/login", json={
+                    "email": f"bench-{run_id}-{i % users}@example.com",
+                    "password": password,
+                })
+                if r.status_code == 200:
+                    tokens[i % users] = r.json()["access_token"]
+                return r.status_code == 200
+
+            results["POST /users/login"] = await drive(args.requests, args.concurrency, login)
+            if not tokens:
+                raise RuntimeError("No bench user could log in, check the login rate limit settings")
+
+            headers = [{"Authorization": f"Bearer {token}"} for token in tokens.values()]
+
+            def auth(i):
+                return headers[i % len(headers)]
+
+            task_ids = {}
+
+            async def create(i):
+                r = await client.post("/tasks/create", headers=auth(i), json={
+                    "task_name": f"bench-{run_id}-{i}",
+                    "task_description": "benchmark task",
+                })
+                if r.status_code == 200:
+                    task_ids[i] = r.json()["task_id"]
+                return r.status_code == 200
+
+            async def view(i):
+                r = await client.get("/tasks/view", headers=auth(i))
+                return r.status_code == 200
+
+            async def update(i):
+                r = await client.put(f"/tasks/update/{task_ids[i]}", headers=auth(i), json={
+                    "task_description": "benchmark task, updated",
+                    "task_status": "completed",
+                })
+                return r.status_code == 200
+
+            async def notifications(i):
+                r = await client.get("/notification/me", headers=auth(i))
+                return r.status_code == 200
+
+            async def remove(i):
+                r = await client.delete(f"/tasks/delete/{task_ids[i]}", headers=auth(i))
+                return r.status_code == 200
+
+            results["POST /tasks/create"] = await drive(args.requests, args.concurrency, create)
+            created = list(task_ids)
+            results["GET /tasks/view"] = await drive(args.requests, args.concurrency, view)
+            results["PUT /tasks/update"] = await drive(len(created), args.concurrency, lambda i: update(created[i]))
+            results["GET /notification/me"] = await drive(args.requests, args.concurrency, notifications)
+            results["DELETE /tasks/delete"] = await drive(len(created), args.concurrency, lambda i: remove(created[i]))
+
+        results["websocket fan-out"] = await fanout(manager, args.sockets, args.messages)
+
+    return results
+
+
+def prepare_env(args):
+    # must happen before main is imported, the app reads its settings at import time
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("ADMIN_USERNAME", "bench-admin")
+    os.environ.setdefault("ADMIN_EMAIL", "bench-admin@example.com")
+    os.environ.setdefault("ADMIN_PASSWORD", "bench-admin-password")
+    # every bench user logs in from the same address, so throttling would only measure 429s
+    os.environ.setdefault("LOGIN_RATE_LIMIT_PER_EMAIL", "1000000")
+    os.environ.setdefault("LOGIN_RATE_LIMIT_PER_IP", "1000000")
+    os.environ.setdefault("WS_MAX_CONNECTIONS", str(args.sockets + 100))
+
+
+def run(args):
+    if args.database_url is None:
+        args.database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="bench-"), "bench.db")
+    prepare_env(args)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    results = asyncio.run(run_suite(args))
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": args.database_url.split("://")[0],
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+        },
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)["results"]
+    with open(args.new) as f:
+        new = json.load(f)["results"]
+
+    regressions = []
+    rows = []
+    for name in base:
+        if name not in new:
+            continue
+        old_p95, new_p95 = base[name]["p95_ms"], new[name]["p95_ms"]
+        old_rps, new_rps = base[name]["throughput_rps"], new[name]["throughput_rps"]
+
+        slower = old_p95 > 0 and new_p95 > old_p95 * (1 + args.threshold)
+        fewer = old_rps > 0 and new_rps < old_rps * (1 - args.threshold)
+        flag = "REGRESSION" if slower or fewer else "ok"
+        if slower or fewer:
+            regressions.append(name)
+
+        rows.append({
+            "endpoint": name,
+            "p95_ms": [old_p95, new_p95],
+            "throughput_rps": [old_rps, new_rps],
+            "status": flag,
+        })
+
+    print(json.dumps({"threshold": args.threshold, "comparison": rows, "regressions": regressions}, indent=2))
+    sys.exit(1 if regressions else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and throughput benchmark for the task manager API")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="benchmark the app in-process and print a JSON report")
+    run_parser.add_argument("--database-url", default=None, help="defaults to a fresh sqlite file")
+    run_parser.add_argument("--concurrency", type=int, default=20)
+    run_parser.add_argument("--requests", type=int, default=200, help="calls per endpoint")
+    run_parser.add_argument("--users", type=int, default=20, help="distinct bench users to register")
+    run_parser.add_argument("--sockets", type=int, default=1000, help="sockets in the fan-out test")
+    run_parser.add_argument("--messages", type=int, default=20, help="broadcasts in the fan-out test")
+    run_parser.add_argument("--output", help="also write the report to this file")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two reports")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative change, 0.10 = 10%%")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,28 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 from app.db.database import Base, engine
+from app.db.search import create_search_index
 from app.admin.userRoutes import router as admin_user
 from app.admin.taskRoutes import router as admin_task
+from app.admin.exportRoutes import router as admin_export
+from app.admin.systemRoutes import router as admin_system
 from app.routers.users import router as user_account
 from app.routers.tasks import router as user_task
 from app.routers.notifications import router as notification
-from app.notification.manager import router as webSocket_router
+from app.notification.manager import router as webSocket_router, manager
 from app.admin.admin import create_default_admin
+from app.core.hashing import password_hasher
+from app.core.auth import revocation_store
+from app.core.config import (REVOCATION_SYNC_INTERVAL, COMPRESSION_MIN_SIZE, GZIP_LEVEL, BROTLI_LEVEL,
+                             ZSTD_LEVEL, WS_PER_MESSAGE_DEFLATE, WS_PING_INTERVAL, WS_PING_TIMEOUT, WS_REAP_INTERVAL)
+from app.core.metrics import MetricsMiddleware, instrument_engine, metrics
+from app.core.compression import CompressionMiddleware
+from app.core.cache import task_cache
+from app.db.slow_query import slow_query_log
 
 # load env FIRST
 load_dotenv()
@@ -17,22 +30,69 @@ load_dotenv()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # create tables
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_search_index)
 
     # create default admin if not exists
-    create_default_admin()
+    await create_default_admin()
+
+    # subscribe this worker to real-time notifications and sweep stale connections
+    await manager.start(WS_REAP_INTERVAL)
+
+    # load revoked tokens, then keep following revocations made by other workers
+    await revocation_store.sync()
+    revocation_sync = asyncio.create_task(revocation_store.run(REVOCATION_SYNC_INTERVAL))
 
     yield
 
+    revocation_sync.cancel()
+    await manager.stop()
+
+    # let in-flight hashes finish before the worker exits
+    password_hasher.shutdown()
+    await engine.dispose()
+
 app = FastAPI(lifespan=lifespan)
 
+# per-route latency, in-flight requests and query counts, also sent back as Server-Timing
+instrument_engine(engine.sync_engine)
+slow_query_log.attach(engine.sync_engine)
+metrics.collectors.append(manager.metric_lines)
+# cached task pages are invalidated on every worker, not just the one that took the write
+task_cache.publishers.append(manager.publish_invalidation)
+# negotiated gzip/brotli/zstd, added first so its cpu time shows up in the request metrics
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    gzip_level=GZIP_LEVEL,
+    brotli_level=BROTLI_LEVEL,
+    zstd_level=ZSTD_LEVEL
+)
+app.add_middleware(MetricsMiddleware, openapi=app.openapi)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 app.include_router(user_account, prefix="/users", tags=["User"])
 app.include_router(user_task, prefix="/tasks", tags=["Task"])
 app.include_router(admin_user, prefix="/admin", tags=["Admin-User"])
 app.include_router(admin_task, prefix="/admin", tags=["Admin-Task"])
+app.include_router(admin_export, prefix="/admin", tags=["Admin-Export"])
+app.include_router(admin_system, prefix="/admin", tags=["Admin-System"])
 app.include_router(notification, prefix="/notification", tags=["Notification"])
 app.include_router(webSocket_router, prefix="/socket", tags=["WebSocket"])
 
 if __name__=="__main__":
     import uvicorn
-    uvicorn.run(app=app)
\ No newline at end of file
+    # websocket notifications negotiate permessage-deflate with clients that offer it,
+    # protocol pings drop half-open sockets that never answer
+    uvicorn.run(
+        app=app,
+        ws_per_message_deflate=WS_PER_MESSAGE_DEFLATE,
+        ws_ping_interval=WS_PING_INTERVAL,
+        ws_ping_timeout=WS_PING_TIMEOUT
+    )
\ No newline at end of file